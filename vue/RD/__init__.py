@@ -21,14 +21,25 @@ def create_app():
     jwt.init_app(app)
 
     # 启用 Flask-CORS
-    CORS(app, resources={r"/*": {"origins": "*"}})  # 允许所有来源的跨域请求
+    CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=['X-Next-Cursor'])  # 允许所有来源的跨域请求，前端可读取分页游标响应头
 
-    from tokenblock import TokenBlocklist
+    # 分页游标无法解析时统一返回 400
+    from pagination import CursorError
 
+    @app.errorhandler(CursorError)
+    def invalid_cursor(error):
+        return {"state": 0, "message": "Invalid cursor"}, 400
+
+    from tokenblock import blocklist_cache
+    blocklist_cache.init_app(app)
+    from adminauth import admin_identities
+    admin_identities.init_app(app)
+
+    # 先查进程内的布隆过滤器，只有可能已注销时才查数据库
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
-        jti = jwt_payload["jti"]
-        return db.session.query(TokenBlocklist.id).filter_by(jti=jti).first() is not None
+        jti = jwt_payload.get("jti")
+        return jti is not None and blocklist_cache.is_revoked(jti)
 
     # ✅ 自定义被拉黑的 token 返回
     @jwt.revoked_token_loader
@@ -52,4 +63,71 @@ def create_app():
     app.register_blueprint(follow_bp)
     app.register_blueprint(commentlike_bp)
     app.register_blueprint(articalfavo_bp)
+
+    from textanalysis import text_analyzer
+    text_analyzer.init_app(app)
+    # 搜索倒排索引(定期同步其他进程写入的文章)
+    from jobs import start_periodic
+    from searchindex import search_index
+    search_index.init_app(app)
+    start_periodic(app, 'search-resync', app.config['SEARCH_INDEX_RESYNC_SECONDS'], search_index.resync)
+
+    # 加载持久化的推荐索引(定期同步其他进程写入的文章)，并启动协同过滤相似度、相似文章表的后台重建任务(文章变化后的增量重算也在后台批量执行)
+    from recommender import recommend_index, item_similarity, rebuild_neighbours, flush_neighbours
+    recommend_index.init_app(app)
+    start_periodic(app, 'recommend-resync', app.config['RECOMMEND_INDEX_RESYNC_SECONDS'], recommend_index.resync)
+    start_periodic(app, 'cf-rebuild', app.config['RECOMMEND_CF_REFRESH_SECONDS'], item_similarity.rebuild, delay=5)
+    start_periodic(app, 'neighbour-rebuild', app.config['RECOMMEND_SIMILAR_REFRESH_SECONDS'], rebuild_neighbours)
+    start_periodic(app, 'neighbour-refresh', app.config['RECOMMEND_SIMILAR_QUEUE_SECONDS'], flush_neighbours)
+
+    # 搜索建议的前缀索引按热度周期性重建
+    from suggest import suggest_index
+    start_periodic(app, 'suggest-rebuild', app.config['SUGGEST_REFRESH_SECONDS'], suggest_index.rebuild)
+
+    # 热门文章的衰减热度、趋势榜的小时计数：首次使用时构建，之后周期性重建
+    from hotrank import hot_rank, trending
+    hot_rank.init_app(app)
+    trending.init_app(app)
+    start_periodic(app, 'hot-rebuild', app.config['HOT_REBUILD_SECONDS'], hot_rank.rebuild)
+    start_periodic(app, 'trending-rebuild', app.config['HOT_REBUILD_SECONDS'], trending.rebuild)
+
+    # 阅读量的批量写回
+    from readcounter import read_counter
+    read_counter.init_app(app)
+    start_periodic(app, 'read-count-flush', app.config['READ_COUNT_MAX_STALENESS'], read_counter.flush)
+
+    # 浏览记录的异步批量写入(写入线程在 run.py 建表、回填之后启动)，以及原始浏览记录的保留期任务
+    from browselog import browse_log, compact_browse_records
+    browse_log.init_app(app)
+    start_periodic(app, 'browse-retention', app.config['BROWSE_RETENTION_INTERVAL'], compact_browse_records, delay=60)
+
+    # 定期分批清理已过期的注销记录(其他进程注销的 Token 在请求时增量同步)
+    from tokenblock import purge_expired_tokens
+    start_periodic(app, 'blocklist-purge', app.config['BLOCKLIST_PURGE_SECONDS'],
+                   lambda: purge_expired_tokens(app.config['BLOCKLIST_PURGE_BATCH']), delay=120)
+
+    # 独立读者数草图的定期写回
+    from hll import reader_sketches
+    reader_sketches.init_app(app)
+    start_periodic(app, 'reader-sketch-flush', app.config['READER_SKETCH_FLUSH_SECONDS'], reader_sketches.flush)
+
+    # 命令行：flask --app run reconcile-counters [--dry-run]，重新计算用户计数列并报告偏差
+    import click
+    from usercounters import reconcile_user_counters
+
+    @app.cli.command('reconcile-counters')
+    @click.option('--dry-run', is_flag=True, help='只报告偏差，不修正')
+    @click.option('--batch-size', default=1000, show_default=True, help='每批处理的用户数')
+    def reconcile_counters_command(dry_run, batch_size):
+        drift = reconcile_user_counters(batch_size, fix=not dry_run)
+        for user_id, name, stored, actual in drift:
+            click.echo(f"user {user_id} {name}: {stored} -> {actual}")
+        click.echo(f"{len(drift)} 处偏差" + ("，未修正(--dry-run)" if dry_run else "，已修正"))
+
+    # 命令行：flask --app run rebuild-timelines，重建关注动态时间线(升级后首次运行或调整阈值后)
+    from timeline import rebuild_timelines
+
+    @app.cli.command('rebuild-timelines')
+    def rebuild_timelines_command():
+        click.echo(f"已重建 {rebuild_timelines()} 个作者的时间线扩散")
     return app
\ No newline at end of file
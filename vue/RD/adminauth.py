@@ -0,0 +1,109 @@
+import time
+import functools
+import threading
+from collections import OrderedDict
+from flask import jsonify
+from flask_jwt_extended import get_jwt_identity, jwt_required
+from db import Manager
+
+IDENTITY_FIELDS = ('mng_id', 'mng_name', 'mng_phone', 'mng_email', 'mng_gender', 'mng_nickname', 'mng_avatar',
+                   'mng_create_at')
+
+
+class ManagerIdentity:
+    """管理员身份的只读快照(不含密码哈希)，与 Manager 同名属性，供鉴权和只读接口使用"""
+    __slots__ = IDENTITY_FIELDS
+
+    def __init__(self, manager):
+        for name in IDENTITY_FIELDS:
+            setattr(self, name, getattr(manager, name))
+
+
+class AdminIdentityCache:
+    """
+    管理员身份解析的进程内缓存(LRU + TTL)
+    - 管理端接口每次请求都要按 Token 中的 id 确认管理员身份，命中缓存时不查数据库
+    - 删除管理员、修改个人信息后立即失效本进程的缓存；其他进程最多在 ttl 秒后生效
+    - 不缓存"不存在"的结果，新增的管理员立即可用
+    """
+
+    def __init__(self, ttl=30, max_size=1000):
+        self.lock = threading.Lock()
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()  # mng_id -> (过期时间, ManagerIdentity)
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.ttl = app.config['ADMIN_IDENTITY_TTL']
+        self.max_size = app.config['ADMIN_IDENTITY_CACHE_SIZE']
+
+    def get(self, mng_id):
+        """返回 ManagerIdentity，管理员不存在时返回 None"""
+        try:
+            mng_id = int(mng_id)
+        except (TypeError, ValueError):
+            return None
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(mng_id)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(mng_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        manager = Manager.query.get(mng_id)
+        if manager is None:
+            self.invalidate(mng_id)
+            return None
+        identity = ManagerIdentity(manager)
+        with self.lock:
+            self.entries[mng_id] = (now + self.ttl, identity)
+            self.entries.move_to_end(mng_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, mng_id):
+        with self.lock:
+            self.entries.pop(int(mng_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+admin_identities = AdminIdentityCache()
+
+
+def current_manager():
+    """当前 Token 对应的管理员身份(ManagerIdentity)，不是管理员时返回 None"""
+    return admin_identities.get(get_jwt_identity())
+
+
+# 管理端(server/manager.py)接口身份验证失败时的响应体
+MANAGER_AUTH_FAILED = {"state": 0, "message": "管理员身份验证失败"}
+
+
+def admin_required(f=None, *, status=403, body=None):
+    """
+    要求请求携带管理员的 Token(身份通过 admin_identities 缓存解析，视图中用 current_manager() 获取)
+    - 直接使用 @admin_required 时失败返回 {"error": "管理员身份验证失败"}, 403
+    - @admin_required(status=..., body=...) 指定失败时的状态码和响应体
+    """
+    if f is None:
+        return functools.partial(admin_required, status=status, body=body)
+
+    @jwt_required()
+    @functools.wraps(f)
+    def decorated_function(*args, **kwargs):
+        if current_manager() is None:
+            return jsonify(body or {"error": "管理员身份验证失败"}), status
+        return f(*args, **kwargs)
+
+    return decorated_function
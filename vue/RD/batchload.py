@@ -0,0 +1,37 @@
+from flask import g
+from __init__ import db
+
+
+class BatchLoader:
+    """
+    按主键批量加载某个模型(请求内有效)
+    - load_many 收集本次需要的 id，未加载过的用一条 IN (...) 查询取回
+    - 已加载的对象(包括不存在的 id)记在 identity 缓存里，同一请求内不会重复查询
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.pk = model.__mapper__.primary_key[0]
+        self.cache = {}  # id -> 对象，不存在时为 None
+
+    def load_many(self, ids):
+        """按顺序返回对象列表，不存在的 id 对应 None"""
+        ids = list(ids)
+        missing = {i for i in ids if i is not None and i not in self.cache}
+        if missing:
+            for obj in db.session.query(self.model).filter(self.pk.in_(missing)).all():
+                self.cache[getattr(obj, self.pk.key)] = obj
+            for i in missing:
+                self.cache.setdefault(i, None)
+        return [self.cache.get(i) for i in ids]
+
+    def load(self, id):
+        return self.load_many([id])[0]
+
+
+def loader(model):
+    """当前请求的 BatchLoader(保存在 flask.g 中，请求结束即丢弃)"""
+    loaders = g.setdefault('batch_loaders', {})
+    if model not in loaders:
+        loaders[model] = BatchLoader(model)
+    return loaders[model]
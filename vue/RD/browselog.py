@@ -0,0 +1,236 @@
+import queue
+import random
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from __init__ import db
+from db import UserBrowseRecord, UserBrowseLatest, ArticleBrowseDaily, DataMigration
+
+BROWSE_LATEST_BACKFILL = 'browse_latest_backfill'  # 迁移标记：user_browse_latest 已从原始浏览记录回填
+
+
+def _greatest(conn, a, b):
+    return func.max(a, b) if conn.dialect.name == 'sqlite' else func.greatest(a, b)
+
+
+def upsert(conn, table, rows, keys, merge):
+    """
+    批量 插入或合并(按方言使用 ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE)
+    - keys: 冲突判断的主键列名
+    - merge: {列名: 函数(现有值列, 新值列) -> 合并后的表达式}
+    """
+    if conn.dialect.name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update({name: fn(table.c[name], stmt.inserted[name]) for name, fn in merge.items()})
+    else:
+        if conn.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_={
+            name: fn(table.c[name], stmt.excluded[name]) for name, fn in merge.items()})
+    conn.execute(stmt)
+
+
+def upsert_latest(conn, rows):
+    """把一批浏览记录合并进 user_browse_latest：每个 (用户, 文章) 一行，保留最新时间并累加次数"""
+    latest = {}
+    for row in rows:
+        key = (row['user_id'], row['article_id'])
+        entry = latest.get(key)
+        if entry is None:
+            latest[key] = {'user_id': key[0], 'article_id': key[1], 'browse_time': row['browse_time'], 'view_count': 1}
+        else:
+            entry['browse_time'] = max(entry['browse_time'], row['browse_time'])
+            entry['view_count'] += 1
+    upsert(conn, UserBrowseLatest.__table__, list(latest.values()), ['user_id', 'article_id'], {
+        'browse_time': lambda old, new: _greatest(conn, old, new),
+        'view_count': lambda old, new: old + new,
+    })
+
+
+class BrowseLogWriter:
+    """
+    浏览记录(UserBrowseRecord)的异步批量写入
+    - 请求中只把记录放入有界队列，不再在请求事务里插入
+    - 后台线程攒批后一次 executemany 插入(最多 batch_size 条，或等待 flush_interval 秒)
+    - 背压：队列超过高水位后按 sample_rate 抽样接收，队列满时直接丢弃，并分别计数
+    - 同一事务中 upsert 每个 (用户, 文章) 的最新浏览(user_browse_latest)
+    - 写入线程由 start() 启动(run.py 在建表、回填 user_browse_latest 之后调用)；
+      未开启 BACKGROUND_JOBS 或未启动时(脚本、测试)同步写入
+    """
+
+    def __init__(self):
+        self.queue = None
+        self.thread = None
+        self.app = None
+        self.stopping = threading.Event()
+        self.batch_size = 500
+        self.flush_interval = 1.0
+        self.high_water = 0.8
+        self.sample_rate = 0.1
+        self.stats_lock = threading.Lock()
+        self.accepted = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def init_app(self, app):
+        self.app = app
+        self.queue = queue.Queue(maxsize=app.config['BROWSE_QUEUE_SIZE'])
+        self.batch_size = app.config['BROWSE_BATCH_SIZE']
+        self.flush_interval = app.config['BROWSE_FLUSH_SECONDS']
+        self.high_water = app.config['BROWSE_QUEUE_HIGH_WATER']
+        self.sample_rate = app.config['BROWSE_SAMPLE_RATE']
+
+    def start(self):
+        if self.app.config.get('BACKGROUND_JOBS') and self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='browse-log-writer', daemon=True)
+            self.thread.start()
+            atexit.register(self.close)
+
+    def submit(self, user_id, article_id, browse_time):
+        row = {'user_id': int(user_id), 'article_id': article_id, 'browse_time': browse_time}
+        if self.thread is None:
+            self._write([row])
+            return True
+        if self.queue.qsize() >= self.queue.maxsize * self.high_water and random.random() >= self.sample_rate:
+            with self.stats_lock:
+                self.sampled_out += 1
+            return False
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            with self.stats_lock:
+                self.dropped += 1
+            return False
+        with self.stats_lock:
+            self.accepted += 1
+        return True
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    batch = [self.queue.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    if self.stopping.is_set():
+                        return
+                    continue
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._write(batch)
+
+    def _write(self, rows):
+        start = time.perf_counter()
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(UserBrowseRecord.__table__.insert(), rows)
+                upsert_latest(conn, rows)
+        except Exception:
+            logging.exception(f"浏览记录批量写入失败，丢弃 {len(rows)} 条")
+            with self.stats_lock:
+                self.failed += len(rows)
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.stats_lock:
+            self.written += len(rows)
+            self.flushes += 1
+            self.last_flush_ms = elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            self.total_flush_ms += elapsed
+
+    def close(self, timeout=5):
+        """进程退出时写完队列中剩余的记录"""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                "queue_depth": self.queue.qsize() if self.queue else 0,
+                "queue_capacity": self.queue.maxsize if self.queue else 0,
+                "accepted": self.accepted,
+                "sampled_out": self.sampled_out,
+                "dropped": self.dropped,
+                "written": self.written,
+                "failed": self.failed,
+                "flushes": self.flushes,
+                "last_flush_ms": round(self.last_flush_ms, 2),
+                "max_flush_ms": round(self.max_flush_ms, 2),
+                "avg_flush_ms": round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0,
+            }
+
+
+browse_log = BrowseLogWriter()
+
+
+def backfill_browse_latest(batch_size=5000):
+    """
+    升级后首次启动时从原始浏览记录回填 user_browse_latest，完成后写入迁移标记(只执行一次)
+    - 在浏览记录写入线程启动前执行(run.py)
+    - 与表中已有的行合并(取较晚的时间、较大的次数)，重复执行或多个进程同时执行结果不变
+    - 迁移标记写入之前，保留期任务不会删除任何原始记录
+    返回本次是否执行了回填
+    """
+    if DataMigration.is_applied(BROWSE_LATEST_BACKFILL):
+        return False
+    rows = (db.session.query(UserBrowseRecord.user_id, UserBrowseRecord.article_id,
+                             func.max(UserBrowseRecord.browse_time), func.count(UserBrowseRecord.id))
+            .group_by(UserBrowseRecord.user_id, UserBrowseRecord.article_id).all())
+    with db.engine.begin() as conn:
+        for start in range(0, len(rows), batch_size):
+            upsert(conn, UserBrowseLatest.__table__, [
+                {'user_id': user_id, 'article_id': article_id, 'browse_time': browse_time, 'view_count': count}
+                for user_id, article_id, browse_time, count in rows[start:start + batch_size]
+            ], ['user_id', 'article_id'], {
+                'browse_time': lambda old, new: _greatest(conn, old, new),
+                'view_count': lambda old, new: _greatest(conn, old, new),
+            })
+    DataMigration.mark_applied(BROWSE_LATEST_BACKFILL)
+    logging.info(f"user_browse_latest 已从原始浏览记录回填: {len(rows)} 行")
+    return True
+
+
+def compact_browse_records(batch_size=5000):
+    """
+    保留期任务：把超过 BROWSE_RETENTION_DAYS 天的原始浏览记录按 (文章, 天) 汇总进 article_browse_daily 后删除
+    按整天处理，分批提交；每个 (用户, 文章) 的最新浏览和累计次数已在 user_browse_latest 中
+    user_browse_latest 的回填完成(有迁移标记)之前不做任何删除
+    """
+    if not DataMigration.is_applied(BROWSE_LATEST_BACKFILL):
+        logging.warning("user_browse_latest 尚未回填，跳过原始浏览记录的清理")
+        return
+    today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    cutoff = today - timedelta(days=current_app.config['BROWSE_RETENTION_DAYS'])
+    while True:
+        records = (db.session.query(UserBrowseRecord.id, UserBrowseRecord.article_id, UserBrowseRecord.browse_time)
+                   .filter(UserBrowseRecord.browse_time < cutoff)
+                   .order_by(UserBrowseRecord.id).limit(batch_size).all())
+        if not records:
+            return
+        daily = {}
+        for _, article_id, browse_time in records:
+            key = (article_id, browse_time.date())
+            daily[key] = daily.get(key, 0) + 1
+        with db.engine.begin() as conn:
+            upsert(conn, ArticleBrowseDaily.__table__,
+                   [{'article_id': article_id, 'day': day, 'views': views} for (article_id, day), views in daily.items()],
+                   ['article_id', 'day'], {'views': lambda old, new: old + new})
+            conn.execute(UserBrowseRecord.__table__.delete()
+                         .where(UserBrowseRecord.__table__.c.id.in_([record[0] for record in records])))
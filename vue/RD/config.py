@@ -24,3 +24,80 @@ class Config:
     # 启用 Token 黑名单支持
     JWT_BLACKLIST_ENABLED = True
     JWT_BLACKLIST_TOKEN_CHECKS = ['access']
+    # 注销 Token 的进程内缓存(布隆过滤器)
+    BLOCKLIST_BLOOM_CAPACITY = 100000  # 预计的注销记录数，超过后自动扩容
+    BLOCKLIST_BLOOM_ERROR_RATE = 0.001  # 误判率(误判时查一次数据库)
+    BLOCKLIST_MAX_STALENESS_SECONDS = 1  # 其他进程注销的 Token 最多在这么多秒内仍被本进程接受(超过后请求时增量同步)
+    BLOCKLIST_PURGE_SECONDS = 3600  # 清理已过期注销记录的间隔
+    BLOCKLIST_PURGE_BATCH = 1000  # 每批删除的条数
+    # 管理员身份解析缓存：有效期(秒，删除管理员/修改信息在其他进程最多延迟这么久生效)和容量
+    ADMIN_IDENTITY_TTL = 30
+    ADMIN_IDENTITY_CACHE_SIZE = 1000
+
+    # 文本分析(推荐和搜索共用)：bigram 为中文二元词；安装 jieba 后可设为 jieba 使用词典分词
+    TEXT_ANALYZER = os.getenv("TEXT_ANALYZER", "bigram")
+    TEXT_ANALYSIS_CACHE_SIZE = 20000  # 按内容哈希缓存的分析结果数量
+
+    # 搜索倒排索引文件（保存在 Flask instance 目录下）
+    SEARCH_INDEX_FILE = "search_index.pkl"
+    SEARCH_INDEX_RESYNC_SECONDS = 60  # 同步其他进程(多 worker 部署)写入的文章的间隔
+    SEARCH_CACHE_SIZE = 1000  # 缓存的查询数
+    SEARCH_CACHE_TTL = 300  # 查询结果缓存的有效期(秒)
+    SEARCH_CACHE_MAX_HITS = 500  # 每个查询缓存的结果条数
+    SUGGEST_REFRESH_SECONDS = 300  # 搜索建议前缀索引的重建间隔(新文章、热度变化在重建后生效)
+
+    # 推荐索引文件（保存在 Flask instance 目录下）
+    RECOMMEND_INDEX_FILE = "recommend_index.pkl"
+    RECOMMEND_INDEX_RESYNC_SECONDS = 60  # 同步其他进程(多 worker 部署)写入的文章的间隔
+    RECOMMEND_PROFILE_DECAY = 0.1  # 兴趣向量衰减系数：前 10 次浏览取算术平均，之后新浏览占 10% 权重
+    RECOMMEND_PROFILE_TERMS = 200  # 兴趣向量最多保留的词项数
+    RECOMMEND_PROFILE_RECENT = 100  # 兴趣记录中保留的最近浏览文章数
+
+    # 协同过滤(后台任务周期性重建文章相似度，推荐时与内容相似度加权混合)
+    RECOMMEND_CF_WEIGHT = 0.3  # 混合打分中 CF 得分的权重
+    RECOMMEND_CF_LIKE_WEIGHT = 3.0  # 点赞的交互强度
+    RECOMMEND_CF_FAVORITE_WEIGHT = 4.0  # 收藏的交互强度
+    RECOMMEND_CF_NEIGHBOURS = 50  # 每篇文章保留的相似文章数
+    RECOMMEND_CF_REFRESH_SECONDS = 600  # 重建间隔
+
+    # 相似文章(/article/<id>/similar)
+    RECOMMEND_SIMILAR_COUNT = 10  # 每篇文章预先计算的相似文章数
+    RECOMMEND_SIMILAR_REFRESH_SECONDS = 3600  # 全量重算间隔
+    RECOMMEND_SIMILAR_QUEUE_SECONDS = 30  # 文章变化后增量重算相似列表的间隔(批量处理期间变化的文章)
+
+    # 热门文章(时间衰减热度)
+    HOT_HALF_LIFE_HOURS = 72  # 热度半衰期
+    HOT_READ_WEIGHT = 1.0
+    HOT_LIKE_WEIGHT = 3.0
+    HOT_FAVORITE_WEIGHT = 4.0
+    HOT_COMMENT_WEIGHT = 2.0
+    HOT_TOP_SIZE = 50  # 维护的排行长度
+    HOT_REBUILD_SECONDS = 1800  # 全量重建间隔
+    TRENDING_CACHE_SECONDS = 60  # 趋势榜(今日/本周/标签)榜单的缓存时间
+
+    # 阅读量写回缓冲：未写回的增量最多保留的时间(秒)
+    READ_COUNT_MAX_STALENESS = 10
+
+    # 浏览记录异步批量写入
+    BROWSE_QUEUE_SIZE = 10000  # 队列容量，满了直接丢弃
+    BROWSE_QUEUE_HIGH_WATER = 0.8  # 队列超过该比例后开始抽样接收
+    BROWSE_SAMPLE_RATE = 0.1  # 超过高水位后的接收比例
+    BROWSE_BATCH_SIZE = 500  # 每批最多插入的条数
+    BROWSE_FLUSH_SECONDS = 1.0  # 攒批的最长等待时间
+    BROWSE_RETENTION_DAYS = 30  # 原始浏览记录保留天数，更早的按天汇总后删除
+    BROWSE_RETENTION_INTERVAL = 6 * 3600  # 保留期任务的执行间隔
+
+    # 独立读者数(HyperLogLog)：精度 p(每个草图 2^p 字节，误差约 1.04/sqrt(2^p))和写回间隔
+    READER_SKETCH_PRECISION = 10
+    READER_SKETCH_FLUSH_SECONDS = 60
+
+    # 关注动态时间线：粉丝数超过该值的作者不写扩散(读取时合并)；关注时补入作者最近的文章数
+    TIMELINE_FANOUT_MAX_FOLLOWERS = 1000
+    TIMELINE_BACKFILL = 50
+
+    # 列表接口的游标分页：默认每页条数和上限(请求参数 limit)
+    PAGE_DEFAULT_LIMIT = 20
+    PAGE_MAX_LIMIT = 100
+
+    # 是否启动后台任务线程
+    BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS", "1") == "1"
@@ -10,6 +10,7 @@ from flask_mail import Message, Mail
 from twilio.rest import Client
 from flask import current_app
 from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 
 mail = Mail()
 
@@ -32,8 +33,95 @@ class User(db.Model):
     is_comment = db.Column(db.Integer, default=1)  # 评论权限,1:可以（默认），0:不可以
     last_login_at = db.Column(db.DateTime)  # 最后登录时间
     is_online = db.Column(db.Boolean, default=False)  # 是否在线
-
-    def to_dict(self):
+    # 冗余计数列：由关注/取消关注、发表/删除文章、发表/删除评论在同一事务中原子增减，可用 flask reconcile-counters 校正
+    article_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 发表的文章数量
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 发表的评论数量
+    followers_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 粉丝数量
+    followings_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 关注的人数
+
+    # 计数字段及对应的外键列(在 count_aggregates 中按用户分组计数)
+    COUNT_COLUMNS = {
+        "article_count": lambda: Article.user_id,  # 用户发表的文章数量
+        "comment_count": lambda: Comment.user_id,  # 用户发表的评论数量
+        "like_count": lambda: Alike.user_id,  # 用户点赞数量
+        "followers_count": lambda: Follow.followed_id,  # 粉丝数量，即关注该用户的人数
+        "followings_count": lambda: Follow.follower_id,  # 该用户关注的人数
+    }
+
+    # 有冗余计数列的字段(序列化时直接读列，其余字段仍用聚合查询)
+    COUNTER_COLUMNS = ('article_count', 'comment_count', 'followers_count', 'followings_count')
+
+    @staticmethod
+    def count_aggregates(user_ids, names=None):
+        """
+        一条语句取回一批用户的各项计数：每项计数是一个按用户分组的聚合子查询，与 user 表左连接
+        names: 要计算的字段(默认全部)
+        返回 {user_id: {"article_count": .., ...}}
+        """
+        user_ids = list(set(user_ids))
+        if not user_ids:
+            return {}
+        subqueries = {}
+        for name in names or User.COUNT_COLUMNS:
+            column = User.COUNT_COLUMNS[name]()
+            subqueries[name] = (db.session.query(column.label('user_id'), func.count().label('n'))
+                                .filter(column.in_(user_ids)).group_by(column).subquery())
+        query = db.session.query(User.id, *[func.coalesce(sub.c.n, 0) for sub in subqueries.values()])
+        for sub in subqueries.values():
+            query = query.outerjoin(sub, sub.c.user_id == User.id)
+        return {row[0]: dict(zip(subqueries, row[1:])) for row in query.filter(User.id.in_(user_ids))}
+
+    @staticmethod
+    def aggregate_names():
+        """没有冗余计数列、序列化时需要聚合查询的字段"""
+        return [name for name in User.COUNT_COLUMNS if name not in User.COUNTER_COLUMNS]
+
+    @staticmethod
+    def bump_counters(user_id, **deltas):
+        """在调用方的事务中原子地增减计数列(UPDATE ... SET col = col + n)，随调用方的 commit 一起提交"""
+        db.session.query(User).filter(User.id == user_id).update(
+            {getattr(User, name): getattr(User, name) + delta for name, delta in deltas.items()},
+            synchronize_session=False)
+
+    @staticmethod
+    def browse_records_of(user_ids):
+        """一批用户的浏览记录(一条查询，最新优先)，返回 {user_id: [记录]}"""
+        user_ids = list(set(user_ids))
+        records = {user_id: [] for user_id in user_ids}
+        if not user_ids:
+            return records
+        rows = (db.session.query(UserBrowseRecord.id, UserBrowseRecord.user_id, UserBrowseRecord.article_id,
+                                 Article.title, UserBrowseRecord.browse_time)
+                .join(Article, Article.id == UserBrowseRecord.article_id)
+                .filter(UserBrowseRecord.user_id.in_(user_ids))
+                .order_by(UserBrowseRecord.browse_time.desc(), UserBrowseRecord.id.desc()))
+        for record_id, user_id, article_id, title, browse_time in rows:
+            records[user_id].append({
+                "record_id": record_id,
+                "article_id": article_id,
+                "article_title": title,
+                "browse_time": browse_time.isoformat()
+            })
+        return records
+
+    @staticmethod
+    def to_dict_list(users, with_browse_records=False):
+        """序列化一批用户，计数只查询一次；with_browse_records 时浏览记录也只查询一次"""
+        users = list(users)
+        counts = User.count_aggregates((user.id for user in users), User.aggregate_names())
+        records = User.browse_records_of(user.id for user in users) if with_browse_records else {}
+        return [user.to_dict(counts.get(user.id), records.get(user.id)) for user in users]
+
+    def to_dict(self, counts=None, browse_records=None):
+        """
+        counts: count_aggregates 的结果(批量序列化时传入)，缺省时单独查询一次
+        browse_records: 传入时内嵌浏览记录(管理员接口 ?include=browse_records)，默认不内嵌，
+        分页获取：/manager/user/<id>/browse-records
+        """
+        if counts is None:
+            counts = User.count_aggregates([self.id], User.aggregate_names()).get(self.id, {})
+        counts = dict(counts, **{name: getattr(self, name) or 0 for name in User.COUNTER_COLUMNS})
+        extra = {"browse_records": browse_records} if browse_records is not None else {}
         return {
             "id": self.id,  # 用户ID，主键
             "username": self.username,  # 用户名，唯一
@@ -49,21 +137,8 @@ class User(db.Model):
             "u_status": self.u_status,  # 用户状态，0为正常，1为禁用
             "is_publish": self.is_publish,  # 是否有发布权限，1为有，0为无
             "is_comment": self.is_comment,  # 是否有评论权限，1为有，0为无
-            "article_count": len(self.articles) if hasattr(self, 'articles') else 0,  # 用户发表的文章数量
-            "comment_count": len(self.comments) if hasattr(self, 'comments') else 0,  # 用户发表的评论数量
-            "like_count": len(self.likes) if hasattr(self, 'likes') else 0,  # 用户点赞数量
-            "followers_count": self.followers.count() if hasattr(self, 'followers') else 0,  # 粉丝数量，即关注该用户的人数
-            "followings_count": self.followings.count() if hasattr(self, 'followings') else 0,  # 该用户关注的人数
-            # 浏览记录
-            "browse_records": [
-                {
-                    "record_id": record.id,
-                    "article_id": record.article.id,
-                    "article_title": record.article.title,
-                    "browse_time": record.browse_time.isoformat()
-                }
-                for record in sorted(self.records, key=lambda r: r.browse_time, reverse=True)  # 最新优先
-            ] if hasattr(self, 'records') else []
+            **{name: counts.get(name, 0) for name in User.COUNT_COLUMNS},
+            **extra,
         }
 
     def set_password(self, password):
@@ -170,7 +245,41 @@ class Article(db.Model):
             'tag': self.tag,
         }
 
-    def mng_to_dict(self):                         #字典，方便转为json
+    # 管理端展示的互动计数及对应的模型(按 article_id 分组计数)
+    COUNT_MODELS = {
+        'comments_count': lambda: Comment,  # 文章评论数量
+        'likes_count': lambda: Alike,  # 文章点赞数量
+        'favorites_count': lambda: ArticleFavorite,  # 文章收藏数量
+    }
+
+    @staticmethod
+    def count_subqueries(article_ids=None):
+        """每项计数一个按文章分组的聚合子查询 {字段: 子查询(article_id, n)}，article_ids 为空时统计全部文章"""
+        subqueries = {}
+        for name, model in Article.COUNT_MODELS.items():
+            model = model()
+            query = db.session.query(model.article_id.label('article_id'), func.count().label('n'))
+            if article_ids is not None:
+                query = query.filter(model.article_id.in_(article_ids))
+            subqueries[name] = query.group_by(model.article_id).subquery()
+        return subqueries
+
+    @staticmethod
+    def count_aggregates(article_ids):
+        """一条语句取回一批文章的评论/点赞/收藏数 {article_id: {"comments_count": .., ...}}"""
+        article_ids = list(set(article_ids))
+        if not article_ids:
+            return {}
+        subqueries = Article.count_subqueries(article_ids)
+        query = db.session.query(Article.id, *[func.coalesce(sub.c.n, 0) for sub in subqueries.values()])
+        for sub in subqueries.values():
+            query = query.outerjoin(sub, sub.c.article_id == Article.id)
+        return {row[0]: dict(zip(subqueries, row[1:])) for row in query.filter(Article.id.in_(article_ids))}
+
+    def mng_to_dict(self, counts=None):                         #字典，方便转为json
+        """counts: 评论/点赞/收藏数(批量查询的结果)，缺省时单独查询一次"""
+        if counts is None:
+            counts = Article.count_aggregates([self.id]).get(self.id, {})
         return {
             'id': self.id,
             'title': self.title,
@@ -183,9 +292,7 @@ class Article(db.Model):
             'image_path': self.image_path,  # 新增图片路径
             'tag': self.tag,  # 新增分类标签
             'read_count': self.read_count,
-            'comments_count': len(self.comments) if hasattr(self, 'comments') else 0,  # 文章评论数量
-            'likes_count': len(self.likes) if hasattr(self, 'likes') else 0,  # 文章点赞数量
-            'favorites_count': len(self.favorites) if hasattr(self, 'favorites') else 0,  # 文章收藏数量
+            **{name: counts.get(name, 0) for name in Article.COUNT_MODELS},  # 评论、点赞、收藏数量
         }
 
     def update_article(self, new_title=None, new_content=None, new_permission=None, new_status=None,
@@ -356,10 +463,121 @@ class UserBrowseRecord(db.Model):
     user = db.relationship('User', backref=db.backref('records', lazy=True))  # 与 User 的关系
     article = db.relationship('Article', backref=db.backref('records', lazy=True))  # 与 Article 的关系
 
+    __table_args__ = (db.Index('ix_user_browse_record_user_time', 'user_id', 'browse_time'),)  # 按用户分页查看浏览记录
+
     def __repr__(self):
         return f'<BrowseRecord User {self.user_id} viewed Article {self.article_id} at {self.browse_time.isoformat()}>'
 
 
+# 关注动态(首页时间线)：作者发布文章时写入每个粉丝的时间线(粉丝过多的作者改为读取时合并)
+class TimelineEntry(db.Model):
+    __tablename__ = 'timeline_entry'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)  # 时间线所属用户(粉丝)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), primary_key=True)
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # 取消关注时按作者删除
+    create_time = db.Column(db.DateTime, nullable=False)  # 文章的创建时间(排序键)
+
+    __table_args__ = (db.Index('ix_timeline_entry_user_time', 'user_id', 'create_time', 'article_id'),
+                      db.Index('ix_timeline_entry_user_author', 'user_id', 'author_id'))
+
+    def __repr__(self):
+        return f'<TimelineEntry User {self.user_id} Article {self.article_id}>'
+
+
+# 每个用户对每篇文章的最新浏览(浏览记录的压缩表)，写入浏览记录时 upsert
+class UserBrowseLatest(db.Model):
+    __tablename__ = 'user_browse_latest'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), primary_key=True)
+    browse_time = db.Column(db.DateTime, nullable=False)  # 最近一次浏览时间
+    view_count = db.Column(db.Integer, nullable=False, default=1)  # 累计浏览次数(含已清理的原始记录)
+
+    article = db.relationship('Article')
+    user = db.relationship('User')
+
+    __table_args__ = (db.Index('ix_user_browse_latest_user_time', 'user_id', 'browse_time'),
+                      db.Index('ix_user_browse_latest_article', 'article_id'))
+
+    def __repr__(self):
+        return f'<BrowseLatest User {self.user_id} Article {self.article_id} x{self.view_count}>'
+
+
+# 按天汇总的文章浏览量，超过保留期的原始浏览记录汇总到这里后删除
+class ArticleBrowseDaily(db.Model):
+    __tablename__ = 'article_browse_daily'
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<BrowseDaily Article {self.article_id} {self.day}: {self.views}>'
+
+
+# 已完成的一次性数据迁移(例如升级后从原始浏览记录回填 user_browse_latest)，用于判断迁移是否已执行
+class DataMigration(db.Model):
+    __tablename__ = 'data_migration'
+    name = db.Column(db.String(64), primary_key=True)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @classmethod
+    def is_applied(cls, name):
+        return db.session.query(cls.name).filter_by(name=name).first() is not None
+
+    @classmethod
+    def mark_applied(cls, name):
+        """记录迁移已完成(多个进程同时执行时只有一个写入成功，其余忽略)"""
+        db.session.add(cls(name=name))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+
+    def __repr__(self):
+        return f'<DataMigration {self.name}>'
+
+
+# 独立读者数的 HyperLogLog 草图(kind 为 article/author，target_id 为文章或作者 ID)
+class ReaderSketch(db.Model):
+    __tablename__ = 'reader_sketch'
+    kind = db.Column(db.String(16), primary_key=True)
+    target_id = db.Column(db.Integer, primary_key=True)
+    registers = db.Column(db.LargeBinary, nullable=False)  # HLL 寄存器(每个 1 字节)
+    update_time = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReaderSketch {self.kind} {self.target_id}>'
+
+
+# 用户兴趣向量（推荐用），浏览文章时增量更新
+class UserInterest(db.Model):
+    __tablename__ = 'user_interest'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    terms = db.Column(db.Text, nullable=False, default='{}')  # 兴趣词项及权重(JSON)，只保留权重最高的若干项
+    recent_ids = db.Column(db.Text, nullable=False, default='[]')  # 最近浏览的文章 ID(JSON)，最新在前
+    browse_count = db.Column(db.Integer, default=0)  # 已计入兴趣向量的浏览次数
+    update_time = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UserInterest User {self.user_id} ({self.browse_count} browses)>'
+
+
+# 相似文章表（"相关文章"用），由推荐索引预先计算，按 article_id 索引查询
+class ArticleNeighbor(db.Model):
+    __tablename__ = 'article_neighbor'
+    id = db.Column(db.Integer, primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False, index=True)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey('article.id'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)  # TF-IDF 余弦相似度
+    rank = db.Column(db.Integer, nullable=False)  # 相似度排名，从 0 开始
+
+    __table_args__ = (db.UniqueConstraint('article_id', 'neighbor_id', name='_article_neighbor_uc'),)
+
+    neighbor = db.relationship('Article', foreign_keys=[neighbor_id])
+
+    def __repr__(self):
+        return f'<ArticleNeighbor {self.article_id} -> {self.neighbor_id} ({self.score:.4f})>'
+
+
 # 评论点赞类
 class CommentLike(db.Model):
     __tablename__ = 'comment_like'
@@ -0,0 +1,157 @@
+import math
+import atexit
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from __init__ import db
+from db import Article, ReaderSketch, UserBrowseLatest
+
+SKETCH_ARTICLE = 'article'
+SKETCH_AUTHOR = 'author'
+
+
+class HyperLogLog:
+    """
+    HyperLogLog 基数估计：2^p 个 1 字节寄存器，标准误差约 1.04 / sqrt(2^p)
+    p=10 时每个草图 1KB，误差约 3%；两个草图取逐位最大值即可合并
+    """
+
+    def __init__(self, p=10, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, value):
+        x = int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+        index = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def estimate(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * self.m and zeros:
+            return round(self.m * math.log(self.m / zeros))  # 小基数用线性计数修正
+        return round(raw)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data, p=10):
+        return cls(p, data) if data and len(data) == 1 << p else cls(p)
+
+
+class ReaderSketches:
+    """
+    文章/作者的独立读者数(HyperLogLog 近似)
+    - 浏览时只更新内存中的待写回草图，定期与数据库中的草图合并写回(合并是逐位取最大，多进程写回不冲突)
+    - 查询 = 数据库中的草图 合并 本进程未写回的草图，按主键批量读取
+    - 首次写回时若草图表为空，从 user_browse_latest 回填已有的读者
+    """
+
+    def __init__(self, p=10):
+        self.p = p
+        self.lock = threading.Lock()
+        self.pending = {}  # (kind, target_id) -> HyperLogLog
+        self.app = None
+        self.backfilled = False
+
+    def init_app(self, app):
+        self.app = app
+        self.p = app.config['READER_SKETCH_PRECISION']
+        atexit.register(self.flush_at_exit)
+
+    def add_view(self, article_id, author_id, user_id):
+        with self.lock:
+            for key in ((SKETCH_ARTICLE, article_id), (SKETCH_AUTHOR, author_id)):
+                sketch = self.pending.get(key)
+                if sketch is None:
+                    sketch = self.pending[key] = HyperLogLog(self.p)
+                sketch.add(user_id)
+
+    def flush(self):
+        """把待写回的草图合并进数据库，返回写回的草图数"""
+        if not self.backfilled:
+            self._backfill()
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return 0
+        try:
+            self._merge_into_db(pending)
+        except Exception:
+            db.session.rollback()
+            logging.exception("独立读者草图写回失败，保留到下次写回")
+            with self.lock:
+                for key, sketch in pending.items():
+                    if key in self.pending:
+                        sketch.merge(self.pending[key])
+                    self.pending[key] = sketch
+            return 0
+        return len(pending)
+
+    def _merge_into_db(self, sketches):
+        keys_by_kind = {}
+        for kind, target_id in sketches:
+            keys_by_kind.setdefault(kind, []).append(target_id)
+        existing = {}
+        for kind, ids in keys_by_kind.items():
+            rows = (ReaderSketch.query.filter(ReaderSketch.kind == kind, ReaderSketch.target_id.in_(ids))
+                    .with_for_update().all())
+            existing.update({(row.kind, row.target_id): row for row in rows})
+        now = datetime.utcnow()
+        for key, sketch in sketches.items():
+            row = existing.get(key)
+            if row is None:
+                db.session.add(ReaderSketch(kind=key[0], target_id=key[1], registers=sketch.to_bytes(), update_time=now))
+            else:
+                merged = HyperLogLog.from_bytes(row.registers, self.p)
+                merged.merge(sketch)
+                row.registers = merged.to_bytes()
+                row.update_time = now
+        db.session.commit()
+
+    def _backfill(self):
+        self.backfilled = True
+        if ReaderSketch.query.first() is not None:
+            return
+        rows = (db.session.query(UserBrowseLatest.article_id, Article.user_id, UserBrowseLatest.user_id)
+                .join(Article, Article.id == UserBrowseLatest.article_id).yield_per(5000))
+        for article_id, author_id, user_id in rows:
+            self.add_view(article_id, author_id, user_id)
+
+    def flush_at_exit(self):
+        if self.app is not None and self.pending:
+            with self.app.app_context():
+                self.flush()
+
+    def unique_readers(self, kind, target_ids):
+        """批量估计独立读者数 {target_id: 人数}"""
+        target_ids = list(target_ids)
+        if not target_ids:
+            return {}
+        rows = ReaderSketch.query.filter(ReaderSketch.kind == kind, ReaderSketch.target_id.in_(target_ids)).all()
+        stored = {row.target_id: row.registers for row in rows}
+        result = {}
+        with self.lock:
+            for target_id in target_ids:
+                sketch = HyperLogLog.from_bytes(stored.get(target_id), self.p)
+                pending = self.pending.get((kind, target_id))
+                if pending is not None:
+                    sketch.merge(pending)
+                result[target_id] = sketch.estimate()
+        return result
+
+    def unique_readers_of(self, kind, target_id):
+        return self.unique_readers(kind, [target_id])[target_id]
+
+
+reader_sketches = ReaderSketches()
@@ -0,0 +1,376 @@
+import time
+import math
+import heapq
+import threading
+from datetime import datetime, date, timedelta
+from sqlalchemy import func
+from __init__ import db
+from db import Article, Alike, ArticleFavorite, Comment, UserBrowseRecord, ArticleBrowseDaily
+
+HOT_EVENT_READ = 'read'
+HOT_EVENT_LIKE = 'like'
+HOT_EVENT_FAVORITE = 'favorite'
+HOT_EVENT_COMMENT = 'comment'
+
+TRENDING_WINDOWS = {'day': 24, 'week': 24 * 7}  # 趋势榜窗口(小时)
+_EPOCH = datetime(1970, 1, 1)
+
+
+def split_tags(tag):
+    return tuple(dict.fromkeys(t.strip() for t in (tag or '').split('，') if t.strip()))
+
+
+def _hour_of(when):
+    return int((when - _EPOCH).total_seconds() // 3600)
+
+
+def _hour_expr(column):
+    """按小时截断时间的 SQL 表达式：SQLite/MySQL 返回形如 '2024-05-01 13' 的字符串，PostgreSQL 返回 timestamp"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        return func.strftime('%Y-%m-%d %H', column)
+    if dialect == 'postgresql':
+        return func.date_trunc('hour', column)
+    return func.date_format(column, '%Y-%m-%d %H')
+
+
+def _hour_start(value):
+    """_hour_expr 的查询结果转换为该小时开始的 datetime"""
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d %H')
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _day_start(value):
+    """func.date() 在 MySQL 中返回 date，在 SQLite 中返回字符串"""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return datetime.combine(value, datetime.min.time())
+
+
+class HotRank:
+    """
+    热门文章排行(时间衰减热度)
+    - 前向衰减：每次互动贡献 权重 * exp((事件时间 - 基准时间) / tau)，累加为文章的热度值；
+      所有文章的当前热度都要再乘以同一个 exp(-(现在 - 基准时间) / tau)，所以排序只需比较累加值，互动时 O(1) 更新
+    - 撤销互动(取消点赞/收藏、删除评论)按原互动时间减去同样的贡献
+    - 维护按热度排好序的前 N 名，/article/hot 直接读取
+    - 首次使用时按 (文章, 小时) 分组聚合各类互动构建；后台任务周期性重建，重置基准时间并纠正多进程间的偏差
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built = False
+        self.landmark = None  # 基准时间
+        self.scores = {}  # article_id -> 前向衰减的累加热度(只包含可见文章)
+        self.top = []  # 热度最高的 top_size 篇文章 id，按热度降序
+        self.top_dirty = True
+        self.weights = {HOT_EVENT_READ: 1.0, HOT_EVENT_LIKE: 3.0, HOT_EVENT_FAVORITE: 4.0, HOT_EVENT_COMMENT: 2.0}
+        self.tau = 72 * 3600 / math.log(2)
+        self.top_size = 50
+
+    def init_app(self, app):
+        self.weights = {
+            HOT_EVENT_READ: app.config['HOT_READ_WEIGHT'],
+            HOT_EVENT_LIKE: app.config['HOT_LIKE_WEIGHT'],
+            HOT_EVENT_FAVORITE: app.config['HOT_FAVORITE_WEIGHT'],
+            HOT_EVENT_COMMENT: app.config['HOT_COMMENT_WEIGHT'],
+        }
+        self.tau = app.config['HOT_HALF_LIFE_HOURS'] * 3600 / math.log(2)
+        self.top_size = app.config['HOT_TOP_SIZE']
+
+    def _factor(self, when):
+        return math.exp((when - self.landmark).total_seconds() / self.tau)
+
+    def rebuild(self):
+        """
+        按小时聚合各类互动重建热度(与实时记录一样按事件所在的小时计算衰减，取该小时的中点，不晚于现在)
+        超过保留期的浏览只有按天的汇总，按当天中午计算
+        """
+        landmark = datetime.utcnow()
+        visible = Article.query.with_entities(Article.id).filter(Article.permission != 1, Article.status != 1).all()
+        scores = {row[0]: 0.0 for row in visible}
+        sources = [
+            (HOT_EVENT_READ, UserBrowseRecord.article_id, UserBrowseRecord.browse_time, None),
+            (HOT_EVENT_LIKE, Alike.article_id, Alike.create_time, None),
+            (HOT_EVENT_FAVORITE, ArticleFavorite.article_id, ArticleFavorite.create_time, None),
+            (HOT_EVENT_COMMENT, Comment.article_id, Comment.create_time, Comment.status.in_([0, 3])),
+        ]
+        events = []  # (事件, [(article_id, 计算衰减的时间, 次数)])
+        for event, article_col, time_col, condition in sources:
+            hour = _hour_expr(time_col)
+            query = db.session.query(article_col, hour, func.count()).filter(time_col.isnot(None))
+            if condition is not None:
+                query = query.filter(condition)
+            events.append((event, [(article_id, _hour_start(value) + timedelta(minutes=30), count)
+                                   for article_id, value, count in query.group_by(article_col, hour).all()]))
+        # 超过保留期的浏览记录已按天汇总到 article_browse_daily
+        compacted = db.session.query(ArticleBrowseDaily.article_id, ArticleBrowseDaily.day, ArticleBrowseDaily.views)
+        events.append((HOT_EVENT_READ, [(article_id, _day_start(day) + timedelta(hours=12), views)
+                                        for article_id, day, views in compacted.all()]))
+        for event, rows in events:
+            weight = self.weights[event]
+            for article_id, when, count in rows:
+                if article_id in scores:
+                    when = min(when, landmark)
+                    scores[article_id] += weight * count * math.exp((when - landmark).total_seconds() / self.tau)
+
+        with self.lock:
+            self.landmark = landmark
+            self.scores = scores
+            self.top_dirty = True
+            self.built = True
+
+    def ensure_built(self):
+        if not self.built:
+            with self.lock:
+                if not self.built:
+                    self.rebuild()
+
+    # ---------- 增量更新 ----------
+    def record(self, article_id, event, when=None, undo=False):
+        """记录一次互动；undo=True 表示撤销 when 时刻发生的互动"""
+        with self.lock:
+            if not self.built or article_id not in self.scores:
+                return
+            delta = self.weights[event] * self._factor(when or datetime.utcnow())
+            self.scores[article_id] += -delta if undo else delta
+            self._update_top(article_id, undo)
+
+    def _update_top(self, article_id, decreased):
+        if self.top_dirty:
+            return
+        if article_id in self.top:
+            if decreased and len(self.scores) > len(self.top):
+                self.top_dirty = True  # 可能被前 N 名之外的文章超过，下次读取时重新选出
+                return
+        elif len(self.top) < self.top_size:
+            self.top.append(article_id)  # 文章总数不足 N 篇
+        elif self.scores[article_id] > self.scores[self.top[-1]]:
+            self.top[-1] = article_id
+        else:
+            return
+        self.top.sort(key=lambda aid: self.scores[aid], reverse=True)
+
+    def upsert(self, article):
+        """文章创建或可见性变化：可见且不在表中则加入(热度从 0 开始)，不可见则移出"""
+        with self.lock:
+            if not self.built:
+                return
+            if article.permission != 1 and article.status != 1:
+                if article.id not in self.scores:
+                    self.scores[article.id] = 0.0
+                    self._update_top(article.id, False)
+            else:
+                self.remove(article.id)
+
+    def remove(self, article_id):
+        with self.lock:
+            if self.scores.pop(article_id, None) is not None and article_id in self.top:
+                self.top_dirty = True
+
+    # ---------- 查询 ----------
+    def top_articles(self, k):
+        """返回当前热度最高的 k 篇文章 [(article_id, 当前热度)]"""
+        self.ensure_built()
+        with self.lock:
+            if self.top_dirty:
+                self.top = heapq.nlargest(self.top_size, self.scores, key=self.scores.get)
+                self.top_dirty = False
+            decay = math.exp(-(datetime.utcnow() - self.landmark).total_seconds() / self.tau)
+            return [(article_id, self.scores[article_id] * decay) for article_id in self.top[:k]]
+
+
+hot_rank = HotRank()
+
+
+class TrendingBoard:
+    """
+    趋势榜(今日/本周/某个标签下)：按小时分桶的滚动计数
+    - buckets: 小时序号 -> {article_id: 加权互动数}，只保留最长窗口内的桶
+    - totals[window] / tag_totals[window]: 窗口内每篇文章/每个标签的累计值，
+      互动时直接累加，整点滚动时减去移出窗口的桶，查询不需要扫描原始互动记录
+    - 排好序的榜单按 (窗口, 标签) 缓存 cache_ttl 秒
+    - 首次使用时按 (文章, 小时) 分组聚合最近一个最长窗口内的互动构建，后台任务周期性重建
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built = False
+        self.current_hour = None
+        self.buckets = {}
+        self.totals = {window: {} for window in TRENDING_WINDOWS}
+        self.tag_totals = {window: {} for window in TRENDING_WINDOWS}
+        self.article_tags = {}  # article_id -> 标签(只包含可见文章)
+        self.tag_articles = {}  # 标签 -> {article_id}
+        self.boards = {}  # (window, tag) -> (生成时间, [(article_id, score)])
+        self.weights = dict(hot_rank.weights)
+        self.cache_ttl = 60
+        self.board_size = 50
+
+    def init_app(self, app):
+        self.weights = dict(hot_rank.weights)
+        self.cache_ttl = app.config['TRENDING_CACHE_SECONDS']
+        self.board_size = app.config['HOT_TOP_SIZE']
+
+    def rebuild(self):
+        now_hour = _hour_of(datetime.utcnow())
+        since = _EPOCH + timedelta(hours=now_hour - max(TRENDING_WINDOWS.values()) + 1)
+        visible = Article.query.with_entities(Article.id, Article.tag) \
+            .filter(Article.permission != 1, Article.status != 1).all()
+        sources = [
+            (HOT_EVENT_READ, UserBrowseRecord.article_id, UserBrowseRecord.browse_time, None),
+            (HOT_EVENT_LIKE, Alike.article_id, Alike.create_time, None),
+            (HOT_EVENT_FAVORITE, ArticleFavorite.article_id, ArticleFavorite.create_time, None),
+            (HOT_EVENT_COMMENT, Comment.article_id, Comment.create_time, Comment.status.in_([0, 3])),
+        ]
+        rows = []
+        for event, article_col, time_col, condition in sources:
+            hour = _hour_expr(time_col)
+            query = db.session.query(article_col, hour, func.count()).filter(time_col >= since)
+            if condition is not None:
+                query = query.filter(condition)
+            rows.extend((event, article_id, value, count)
+                        for article_id, value, count in query.group_by(article_col, hour).all())
+
+        with self.lock:
+            self.current_hour = now_hour
+            self.buckets = {}
+            self.totals = {window: {} for window in TRENDING_WINDOWS}
+            self.tag_totals = {window: {} for window in TRENDING_WINDOWS}
+            self.article_tags, self.tag_articles, self.boards = {}, {}, {}
+            for article_id, tag in visible:
+                self._set_tags(article_id, split_tags(tag))
+            for event, article_id, value, count in rows:
+                hour = _hour_of(_hour_start(value))
+                self._add(article_id, hour, self.weights[event] * count)
+            self.built = True
+
+    def ensure_built(self):
+        if not self.built:
+            with self.lock:
+                if not self.built:
+                    self.rebuild()
+
+    # ---------- 计数维护(调用方持有锁) ----------
+    def _set_tags(self, article_id, tags):
+        self.article_tags[article_id] = tags
+        for tag in tags:
+            self.tag_articles.setdefault(tag, set()).add(article_id)
+
+    def _bump(self, window, article_id, amount):
+        totals = self.totals[window]
+        value = totals.get(article_id, 0.0) + amount
+        if value > 1e-9:
+            totals[article_id] = value
+        else:
+            totals.pop(article_id, None)
+        tag_totals = self.tag_totals[window]
+        for tag in self.article_tags.get(article_id, ()):
+            value = tag_totals.get(tag, 0.0) + amount
+            if value > 1e-9:
+                tag_totals[tag] = value
+            else:
+                tag_totals.pop(tag, None)
+
+    def _add(self, article_id, hour, amount):
+        if article_id not in self.article_tags or hour > self.current_hour or \
+                hour <= self.current_hour - max(TRENDING_WINDOWS.values()):
+            return
+        bucket = self.buckets.setdefault(hour, {})
+        bucket[article_id] = bucket.get(article_id, 0.0) + amount
+        for window, length in TRENDING_WINDOWS.items():
+            if hour > self.current_hour - length:
+                self._bump(window, article_id, amount)
+
+    def _advance(self, now_hour):
+        """整点滚动：减去移出各窗口的桶，丢弃超出最长窗口的桶"""
+        if now_hour <= self.current_hour:
+            return
+        for window, length in TRENDING_WINDOWS.items():
+            for hour, bucket in self.buckets.items():
+                if self.current_hour - length < hour <= now_hour - length:
+                    for article_id, amount in bucket.items():
+                        self._bump(window, article_id, -amount)
+        longest = max(TRENDING_WINDOWS.values())
+        for hour in [h for h in self.buckets if h <= now_hour - longest]:
+            del self.buckets[hour]
+        self.current_hour = now_hour
+        self.boards = {}
+
+    def _drop_article(self, article_id):
+        """把文章的计数从所有窗口和标签中减掉"""
+        for hour, bucket in self.buckets.items():
+            amount = bucket.pop(article_id, None)
+            if amount:
+                for window, length in TRENDING_WINDOWS.items():
+                    if hour > self.current_hour - length:
+                        self._bump(window, article_id, -amount)
+        for tag in self.article_tags.pop(article_id, ()):
+            articles = self.tag_articles.get(tag)
+            if articles is not None:
+                articles.discard(article_id)
+                if not articles:
+                    del self.tag_articles[tag]
+
+    # ---------- 增量更新 ----------
+    def record(self, article_id, event, when=None, undo=False):
+        with self.lock:
+            if not self.built:
+                return
+            self._advance(_hour_of(datetime.utcnow()))
+            amount = self.weights[event]
+            self._add(article_id, _hour_of(when or datetime.utcnow()), -amount if undo else amount)
+
+    def upsert(self, article):
+        """文章创建、可见性或标签变化；标签变化时计数随文章移到新标签下"""
+        with self.lock:
+            if not self.built:
+                return
+            visible = article.permission != 1 and article.status != 1
+            tags = split_tags(article.tag)
+            if visible and self.article_tags.get(article.id) == tags:
+                return
+            kept = {hour: bucket[article.id] for hour, bucket in self.buckets.items() if article.id in bucket}
+            self._drop_article(article.id)
+            if visible:
+                self._set_tags(article.id, tags)
+                for hour, amount in kept.items():
+                    self._add(article.id, hour, amount)
+
+    def remove(self, article_id):
+        with self.lock:
+            if self.built:
+                self._drop_article(article_id)
+
+    # ---------- 查询 ----------
+    def leaderboard(self, window, tag=None, k=10):
+        """返回窗口(和标签)内互动最多的 k 篇文章 [(article_id, score)]"""
+        self.ensure_built()
+        with self.lock:
+            self._advance(_hour_of(datetime.utcnow()))
+            cached = self.boards.get((window, tag))
+            if cached is None or time.monotonic() - cached[0] > self.cache_ttl:
+                totals = self.totals[window]
+                if tag is None:
+                    candidates = totals
+                else:
+                    candidates = {aid: totals[aid] for aid in self.tag_articles.get(tag, ()) if aid in totals}
+                cached = (time.monotonic(), heapq.nlargest(self.board_size, candidates.items(), key=lambda kv: kv[1]))
+                self.boards[(window, tag)] = cached
+            return cached[1][:k]
+
+    def top_tags(self, window, k=10):
+        self.ensure_built()
+        with self.lock:
+            self._advance(_hour_of(datetime.utcnow()))
+            return heapq.nlargest(k, self.tag_totals[window].items(), key=lambda kv: kv[1])
+
+
+trending = TrendingBoard()
+
+
+def record_engagement(article_id, event, when=None, undo=False):
+    """记录一次互动(阅读/点赞/收藏/评论)：同时更新热门排行和趋势榜"""
+    hot_rank.record(article_id, event, when, undo)
+    trending.record(article_id, event, when, undo)
@@ -0,0 +1,35 @@
+import atexit
+import logging
+import threading
+from __init__ import db
+
+_stop = threading.Event()
+atexit.register(_stop.set)
+
+
+def start_periodic(app, name, interval, func, delay=None):
+    """
+    在守护线程中周期性执行后台任务(每次都在应用上下文中运行)
+    - interval: 执行间隔(秒)
+    - delay: 首次执行前的等待时间(秒)，默认等于 interval
+    未开启 BACKGROUND_JOBS 时不启动(例如脚本或测试中)
+    """
+    if not app.config.get('BACKGROUND_JOBS'):
+        return None
+
+    def loop():
+        wait = interval if delay is None else delay
+        while not _stop.wait(wait):
+            wait = interval
+            with app.app_context():
+                try:
+                    func()
+                except Exception:
+                    logging.exception(f"后台任务 {name} 执行失败")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    thread = threading.Thread(target=loop, name=name, daemon=True)
+    thread.start()
+    return thread
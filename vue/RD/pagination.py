@@ -0,0 +1,105 @@
+import json
+import base64
+from datetime import datetime
+from flask import current_app, request, jsonify
+from sqlalchemy import and_, or_
+
+CURSOR_HEADER = 'X-Next-Cursor'  # 直接返回数组的接口通过响应头返回下一页游标
+
+
+class CursorError(ValueError):
+    """游标无法解析(被篡改或来自其他接口)"""
+
+
+def encode_cursor(values):
+    """把排序键 (例如 (create_time, id)) 编码为不透明的 URL 安全字符串"""
+    data = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_value(value, expected):
+    """按排序列的 Python 类型检查并还原游标中的一个值，类型不符时返回 None"""
+    if expected is datetime:
+        if isinstance(value, dict) and list(value) == ['dt'] and isinstance(value['dt'], str):
+            return datetime.fromisoformat(value['dt'])
+        return None
+    if isinstance(value, bool):
+        return None  # bool 是 int 的子类，但不会出现在排序键中
+    if expected is float and isinstance(value, int):
+        return float(value)
+    return value if isinstance(value, expected) else None
+
+
+def decode_cursor(cursor, types):
+    """
+    解码游标，types 为各排序列的 Python 类型(例如 (datetime, int))
+    元素个数或类型不符(被篡改或来自其他接口)时抛出 CursorError，不会带着错误的值去查询
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(data, list) or len(data) != len(types):
+            raise CursorError(cursor)
+        values = [_decode_value(value, expected) for value, expected in zip(data, types)]
+    except (ValueError, TypeError):
+        raise CursorError(cursor)
+    if any(value is None for value in values):
+        raise CursorError(cursor)
+    return values
+
+
+def page_limit():
+    """
+    每页条数：请求参数 limit，只传 cursor 时缺省 PAGE_DEFAULT_LIMIT，最多 PAGE_MAX_LIMIT
+    limit 和 cursor 都未传时返回 None(不分页，返回全部结果，兼容尚未按游标翻页的客户端)
+    """
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return None
+    limit = request.args.get('limit', current_app.config['PAGE_DEFAULT_LIMIT'], type=int)
+    return min(max(limit, 1), current_app.config['PAGE_MAX_LIMIT'])
+
+
+def _after(columns, values, desc):
+    """排序键严格位于游标之后的条件：(a, b) < (x, y) 展开为 a < x OR (a = x AND b < y)，可以使用联合索引"""
+    conditions = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        bound = column < value if desc else column > value
+        conditions.append(and_(*[c == v for c, v in zip(columns[:i], values[:i])], bound))
+    return or_(*conditions)
+
+
+def keyset_query(query, columns, cursor, limit, desc=True):
+    """排序键位于 cursor(已解码的值或 None)之后的前 limit 条(None 时不限)的查询"""
+    if cursor is not None:
+        query = query.filter(_after(columns, cursor, desc))
+    query = query.order_by(*[column.desc() if desc else column.asc() for column in columns])
+    return query.limit(limit) if limit is not None else query
+
+
+def request_cursor(columns):
+    """请求参数 cursor 按排序列 columns 的类型解码后的排序键，未传时为 None"""
+    cursor = request.args.get('cursor')
+    return decode_cursor(cursor, [column.type.python_type for column in columns]) if cursor else None
+
+
+def keyset_paginate(query, columns, desc=True):
+    """
+    游标(keyset)分页：按 columns(例如 (Article.create_time, Article.id)，最后一列须唯一)排序，
+    从请求参数 cursor 之后取 limit 条，不使用 OFFSET，翻到多深都只扫描一页
+    返回 (本页结果, 下一页游标)，没有下一页时游标为 None；limit 和 cursor 都未传时返回全部结果
+    """
+    limit = page_limit()
+    if limit is None:
+        return keyset_query(query, columns, None, None, desc).all(), None
+    items = keyset_query(query, columns, request_cursor(columns), limit + 1, desc).all()
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor([getattr(items[-1], column.key) for column in columns])
+
+
+def list_response(items, next_cursor):
+    """直接返回数组的接口：下一页游标放在响应头中，保持响应体格式不变"""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers[CURSOR_HEADER] = next_cursor
+    return response
@@ -0,0 +1,79 @@
+import time
+import atexit
+import logging
+import threading
+from sqlalchemy import bindparam, func
+from __init__ import db
+from db import Article
+
+
+class ReadCountBuffer:
+    """
+    文章阅读量的写回缓冲(write-behind)
+    - 阅读时只在内存中累加，不再对文章行做 读-改-写 和单独提交
+    - 定期把累积的增量批量写回：UPDATE article SET read_count = read_count + n (executemany)，
+      原子自增，多进程/多线程下不会丢失更新
+    - 最早的未写回增量超过 max_staleness 秒时(后台任务或下一次阅读时)写回；进程退出时写回
+    - 接口返回的阅读量 = 数据库中的值 + 本进程尚未写回的增量
+    """
+
+    def __init__(self, max_staleness=10):
+        self.lock = threading.Lock()
+        self.pending = {}  # article_id -> 未写回的阅读次数
+        self.oldest = None  # 最早的未写回增量的时间(time.monotonic)
+        self.max_staleness = max_staleness
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        self.max_staleness = app.config['READ_COUNT_MAX_STALENESS']
+        atexit.register(self.flush_at_exit)
+
+    def add(self, article_id, n=1):
+        with self.lock:
+            self.pending[article_id] = self.pending.get(article_id, 0) + n
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            stale = time.monotonic() - self.oldest >= self.max_staleness
+        if stale:
+            self.flush()
+
+    def pending_count(self, article_id):
+        return self.pending.get(article_id, 0)
+
+    def read_count(self, article):
+        """文章当前阅读量(含未写回的增量)"""
+        return (article.read_count or 0) + self.pending_count(article.id)
+
+    def flush(self):
+        """把累积的增量写回数据库(使用独立的连接和事务，不影响调用方的 session)，返回写回的文章数"""
+        with self.lock:
+            pending, self.pending, self.oldest = self.pending, {}, None
+        if not pending:
+            return 0
+        table = Article.__table__
+        stmt = (table.update()
+                .where(table.c.id == bindparam('b_id'))
+                # 阅读量不算文章更新：显式保留 update_time，否则会触发列上的 onupdate
+                .values(read_count=func.coalesce(table.c.read_count, 0) + bindparam('b_n'),
+                        update_time=table.c.update_time))
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(stmt, [{'b_id': aid, 'b_n': n} for aid, n in pending.items()])
+        except Exception:
+            logging.exception("阅读量写回失败，增量保留到下次写回")
+            with self.lock:
+                for aid, n in pending.items():
+                    self.pending[aid] = self.pending.get(aid, 0) + n
+                if self.oldest is None:
+                    self.oldest = time.monotonic()
+            return 0
+        return len(pending)
+
+    def flush_at_exit(self):
+        if self.app is not None and self.pending:
+            with self.app.app_context():
+                self.flush()
+
+
+read_counter = ReadCountBuffer()
@@ -0,0 +1,606 @@
+import os
+import json
+import pickle
+import atexit
+import logging
+import threading
+import numpy as np
+from datetime import timedelta
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from flask import current_app
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+from __init__ import db
+from db import Article, UserInterest, UserBrowseLatest, Alike, ArticleFavorite, ArticleNeighbor
+from textanalysis import text_analyzer
+
+
+RESYNC_OVERLAP = timedelta(seconds=60)  # 增量同步时回看的时间窗口，覆盖其他进程修改时间早于本进程、但提交较晚的文章
+
+
+def is_recommendable(article):
+    """屏蔽(permission=1)或已删除(status=1)的文章不参与推荐"""
+    return article.permission != 1 and article.status != 1
+
+
+class RecommendIndex:
+    """
+    持久化的增量 TF-IDF 推荐索引
+    - 每篇文章只在创建/修改时分词一次，保存词项计数和文档频率(df)
+    - IDF 与 L2 归一化后的稀疏文档矩阵按需重建(O(nnz))，不需要重新分词整个语料库
+    - 索引保存在 instance 目录下，启动时加载，避免每次请求都 fit 一遍 TfidfVectorizer
+    - 分词使用 textanalysis 中与搜索共用的分析流水线(去 HTML、中文二元词、停用词)
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.path = None
+        self.loaded = False
+        self.verified = False  # 本进程内是否已与数据库核对过
+        self.vocabulary = {}  # 词项 -> 列号
+        self.terms = []  # 列号 -> 词项
+        self.df = np.zeros(0, dtype=np.int32)  # 每个词项出现在多少篇文章中
+        self.docs = {}  # article_id -> (列号数组, 词频数组)
+        self.last_update = None  # 已入索引的最近一次文章修改时间，用于启动时判断索引是否过期
+        self.last_id = 0  # 已入索引的最大文章 id(新建文章没有修改时间)，用于增量同步
+        self._snapshot = None  # IndexSnapshot，索引变化后置空、按需重建
+
+    def init_app(self, app):
+        self.path = os.path.join(app.instance_path, app.config['RECOMMEND_INDEX_FILE'])
+        self.load()
+        atexit.register(self.save)
+
+    # ---------- 持久化 ----------
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('analyzer') != text_analyzer.signature:
+                return  # 分词规则已变化，首次使用时重建
+            with self.lock:
+                self.vocabulary = state['vocabulary']
+                self.terms = sorted(self.vocabulary, key=self.vocabulary.get)
+                self.df = state['df']
+                self.docs = state['docs']
+                self.last_update = state.get('last_update')
+                self.last_id = state.get('last_id', 0)
+                self._snapshot = None
+                self.loaded = True
+        except Exception as e:
+            logging.warning(f"加载推荐索引失败，将从数据库重建: {e}")
+
+    def save(self):
+        if not self.path or not self.loaded:
+            return
+        with self.lock:
+            state = {'vocabulary': self.vocabulary, 'df': self.df, 'docs': self.docs,
+                     'last_update': self.last_update, 'last_id': self.last_id, 'analyzer': text_analyzer.signature}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+
+    def rebuild(self):
+        """从数据库全量构建索引(仅在索引文件缺失或与数据库不一致时执行)"""
+        with self.lock:
+            self.last_update = db.session.query(func.max(Article.update_time)).scalar()
+            self.last_id = db.session.query(func.max(Article.id)).scalar() or 0
+            self.vocabulary = {}
+            self.terms = []
+            self.df = np.zeros(0, dtype=np.int32)
+            self.docs = {}
+            self._snapshot = None
+            for article in Article.query.filter(Article.permission != 1, Article.status != 1).all():
+                self._add(article.id, article.title + " " + article.content)
+            self.loaded = True
+        self.save()
+
+    def ensure_loaded(self):
+        """首次使用时核对索引与数据库中的可见文章是否一致，不一致则重建"""
+        if self.verified:
+            return
+        with self.lock:
+            if self.verified:
+                return
+            if not (self.loaded and self._matches_db()):
+                self.rebuild()
+            self.verified = True
+
+    def _matches_db(self):
+        if db.session.query(func.max(Article.update_time)).scalar() != self.last_update:
+            return False
+        visible = Article.query.with_entities(Article.id).filter(Article.permission != 1, Article.status != 1).all()
+        return {row[0] for row in visible} == set(self.docs)
+
+    # ---------- 增量更新 ----------
+    def _add(self, article_id, text):
+        counts = {}
+        for term in text_analyzer.analyze(text):
+            col = self.vocabulary.get(term)
+            if col is None:
+                col = len(self.vocabulary)
+                self.vocabulary[term] = col
+                self.terms.append(term)
+            counts[col] = counts.get(col, 0) + 1
+        if len(self.vocabulary) > len(self.df):
+            grown = np.zeros(max(len(self.vocabulary), 2 * len(self.df)), dtype=np.int32)
+            grown[:len(self.df)] = self.df
+            self.df = grown
+        cols = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        tfs = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        self.df[cols] += 1
+        self.docs[article_id] = (cols, tfs)
+
+    def _remove(self, article_id):
+        doc = self.docs.pop(article_id, None)
+        if doc is not None:
+            self.df[doc[0]] -= 1
+
+    def upsert(self, article):
+        """文章创建/修改/状态变化后调用：可见则(重新)入索引，不可见则移出索引"""
+        with self.lock:
+            if not self.loaded:
+                return  # 索引尚未建立，首次使用时会全量构建
+            if article.update_time and (self.last_update is None or article.update_time > self.last_update):
+                self.last_update = article.update_time
+            self.last_id = max(self.last_id, article.id)
+            self._remove(article.id)
+            if is_recommendable(article):
+                self._add(article.id, article.title + " " + article.content)
+            self._snapshot = None
+
+    def remove(self, article_id):
+        with self.lock:
+            if not self.loaded:
+                return
+            self._remove(article_id)
+            self._snapshot = None
+
+    def resync(self):
+        """
+        与数据库增量同步(后台任务)：其他进程写入的文章只更新了那个进程的内存索引
+        - 取回 id 大于 last_id、或修改时间晚于 last_update(回看 RESYNC_OVERLAP)的文章重新入索引
+        - 物理删除不会留下修改时间：可见文章数与索引不一致时，核对索引中已不在数据库里的文章并移出
+        返回重新入索引和移出的文章数
+        """
+        if not self.loaded:
+            return 0  # 索引尚未建立，首次使用时会全量构建
+        with self.lock:
+            last_update, last_id = self.last_update, self.last_id
+        if last_update is None:
+            changed = or_(Article.id > last_id, Article.update_time.isnot(None))
+        else:
+            changed = or_(Article.id > last_id, Article.update_time > last_update - RESYNC_OVERLAP)
+        articles = Article.query.filter(changed).all()
+        for article in articles:
+            self.upsert(article)
+
+        visible = (db.session.query(func.count(Article.id))
+                   .filter(Article.permission != 1, Article.status != 1).scalar())
+        with self.lock:
+            indexed = set(self.docs)
+        missing = []
+        if visible != len(indexed):
+            ids = {row[0] for row in db.session.query(Article.id).filter(Article.permission != 1, Article.status != 1)}
+            suspects = indexed - ids
+            # 查询之后本进程可能刚写入新文章：逐个确认，仍存在的按当前状态更新，不存在的才移出
+            found = Article.query.filter(Article.id.in_(suspects)).all() if suspects else []
+            for article in found:
+                self.upsert(article)
+            missing = suspects - {article.id for article in found}
+            for article_id in missing:
+                self.remove(article_id)
+        return len(articles) + len(missing)
+
+    # ---------- 查询 ----------
+    def snapshot(self):
+        """
+        返回当前索引的 IndexSnapshot
+        tfidf_matrix 的权重与 TfidfVectorizer 一致(smooth_idf, L2 归一化)
+        返回的对象不会被后续的增量更新修改，可在锁外安全使用；同一次计算中的矩阵、行号、词项列号都应取自同一个快照
+        """
+        self.ensure_loaded()
+        with self.lock:
+            if self._snapshot is None:
+                self._snapshot = self._build_matrix()
+            return self._snapshot
+
+    def _build_matrix(self):
+        row_ids = np.array(sorted(self.docs), dtype=np.int64)
+        n_docs = len(row_ids)
+        n_terms = len(self.vocabulary)
+        lengths = [len(self.docs[aid][0]) for aid in row_ids]
+        indptr = np.zeros(n_docs + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        if n_docs:
+            indices = np.concatenate([self.docs[aid][0] for aid in row_ids])
+            data = np.concatenate([self.docs[aid][1] for aid in row_ids])
+        else:
+            indices = np.zeros(0, dtype=np.int32)
+            data = np.zeros(0, dtype=np.float64)
+        idf = np.log((1 + n_docs) / (1 + self.df[:n_terms].astype(np.float64))) + 1
+        matrix = sparse.csr_matrix((data * idf[indices], indices, indptr), shape=(n_docs, n_terms))
+        if n_docs and n_terms:  # normalize 不接受空矩阵(例如所有文章都没有可用词项)
+            matrix = normalize(matrix, norm='l2', copy=False)
+        return IndexSnapshot(matrix, row_ids, self.vocabulary, self.terms)
+
+
+class IndexSnapshot:
+    """
+    推荐索引某一时刻的只读快照：tfidf 矩阵、行号 <-> article_id、词项 <-> 列号
+    词表只会追加(全量重建时换成新的字典)，快照中的列号始终与 matrix 的列对应
+    """
+
+    def __init__(self, matrix, row_ids, vocabulary, terms):
+        self.matrix = matrix
+        self.row_ids = row_ids  # 行号 -> article_id
+        self.row_of = {int(aid): i for i, aid in enumerate(row_ids)}  # article_id -> 行号
+        self.vocabulary = vocabulary
+        self.terms = terms
+
+    def rows_mask(self, article_ids):
+        """把文章 ID 集合转换为行布尔掩码(通过 article_id -> 行号 哈希表，O(len(article_ids)))"""
+        mask = np.zeros(len(self.row_ids), dtype=bool)
+        rows = [self.row_of[aid] for aid in article_ids if aid in self.row_of]
+        mask[rows] = True
+        return mask
+
+    def user_vector(self, weights):
+        """把兴趣向量 {词项: 权重} 映射为与文档矩阵同维的稠密向量"""
+        vector = np.zeros(self.matrix.shape[1])
+        for term, weight in weights.items():
+            col = self.vocabulary.get(term)
+            if col is not None and col < len(vector):
+                vector[col] = weight
+        return vector
+
+    def article_terms(self, article_id):
+        """文章的 TF-IDF 向量 {词项: 权重}，文章不在索引中时返回 None"""
+        row = self.row_of.get(article_id)
+        if row is None:
+            return None
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        return {self.terms[col]: float(w)
+                for col, w in zip(self.matrix.indices[start:end], self.matrix.data[start:end])}
+
+
+recommend_index = RecommendIndex()
+
+
+class ItemSimilarity:
+    """
+    基于物品的协同过滤(item-item CF)
+    - 由点赞(Alike)、收藏(ArticleFavorite)、浏览(UserBrowseLatest 中的累计次数)构造 用户×文章 稀疏交互矩阵
+    - 文章之间的相似度为交互列向量的余弦相似度(共现)，每篇文章只保留最相似的若干篇
+    - 由后台任务周期性重建，请求中只做一次稀疏向量乘法
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.interactions = None  # 用户×文章 交互矩阵(csr)
+        self.similarity = None  # 文章×文章 相似度矩阵(csr，每行只保留 top-N)
+        self.user_row = {}  # user_id -> 行号
+        self.col_of = {}  # article_id -> 列号
+        self.col_ids = np.zeros(0, dtype=np.int64)  # 列号 -> article_id
+
+    def rebuild(self):
+        config = current_app.config
+        weights = {}  # (user_id, article_id) -> 交互强度
+
+        def add(rows, weight):
+            for user_id, article_id, value in rows:
+                key = (user_id, article_id)
+                weights[key] = weights.get(key, 0.0) + weight(value)
+
+        add(db.session.query(Alike.user_id, Alike.article_id, 1).all(), lambda _: config['RECOMMEND_CF_LIKE_WEIGHT'])
+        add(db.session.query(ArticleFavorite.user_id, ArticleFavorite.article_id, 1).all(),
+            lambda _: config['RECOMMEND_CF_FAVORITE_WEIGHT'])
+        add(db.session.query(UserBrowseLatest.user_id, UserBrowseLatest.article_id, UserBrowseLatest.view_count).all(),
+            lambda count: float(np.log1p(count)))  # 重复浏览收益递减
+
+        if not weights:
+            # 还没有任何点赞/收藏/浏览：normalize 不接受空矩阵，直接清空相似度表(scores 返回 None，只用内容相似度)
+            with self.lock:
+                self.interactions, self.similarity = None, None
+                self.user_row, self.col_of, self.col_ids = {}, {}, np.zeros(0, dtype=np.int64)
+            logging.info("协同过滤相似度已重建: 暂无交互数据")
+            return
+
+        user_ids = sorted({u for u, _ in weights})
+        col_ids = np.array(sorted({a for _, a in weights}), dtype=np.int64)
+        user_row = {u: i for i, u in enumerate(user_ids)}
+        col_of = {int(a): i for i, a in enumerate(col_ids)}
+        rows = np.fromiter((user_row[u] for u, _ in weights), dtype=np.int64, count=len(weights))
+        cols = np.fromiter((col_of[a] for _, a in weights), dtype=np.int64, count=len(weights))
+        data = np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+        interactions = sparse.csr_matrix((data, (rows, cols)), shape=(len(user_ids), len(col_ids)))
+
+        # 列归一化后 X^T X 即为文章间余弦相似度
+        normalized = normalize(interactions.tocsc(), norm='l2', axis=0)
+        similarity = (normalized.T @ normalized).tocsr()
+        similarity.setdiag(0)
+        similarity.eliminate_zeros()
+        similarity = self._keep_top(similarity, config['RECOMMEND_CF_NEIGHBOURS'])
+
+        with self.lock:
+            self.interactions, self.similarity = interactions, similarity
+            self.user_row, self.col_of, self.col_ids = user_row, col_of, col_ids
+        logging.info(f"协同过滤相似度已重建: {len(user_ids)} 用户, {len(col_ids)} 文章, {similarity.nnz} 条相似关系")
+
+    @staticmethod
+    def _keep_top(matrix, n):
+        """每行只保留相似度最高的 n 项"""
+        indptr, indices, data = [0], [], []
+        for row in range(matrix.shape[0]):
+            start, end = matrix.indptr[row], matrix.indptr[row + 1]
+            row_data = matrix.data[start:end]
+            row_indices = matrix.indices[start:end]
+            if len(row_data) > n:
+                keep = np.argpartition(-row_data, n - 1)[:n]
+                row_data, row_indices = row_data[keep], row_indices[keep]
+            indices.append(row_indices)
+            data.append(row_data)
+            indptr.append(indptr[-1] + len(row_data))
+        if not data:
+            return matrix
+        return sparse.csr_matrix((np.concatenate(data), np.concatenate(indices), indptr), shape=matrix.shape)
+
+    def scores(self, user_id, recent_ids, row_of, n_rows):
+        """
+        用户对内容索引中每一行文章的 CF 得分(已缩放到 [0, 1])，无可用数据时返回 None
+        用户的交互向量 = 上次重建时的交互行 + 之后新浏览的文章
+        """
+        with self.lock:
+            interactions, similarity = self.interactions, self.similarity
+            user_row, col_of, col_ids = self.user_row, self.col_of, self.col_ids
+        if similarity is None or not similarity.nnz:
+            return None
+
+        seed = np.zeros(len(col_ids))
+        if user_id in user_row:
+            row = interactions.getrow(user_row[user_id])
+            seed[row.indices] = row.data
+        for article_id in recent_ids:
+            col = col_of.get(article_id)
+            if col is not None:
+                seed[col] = max(seed[col], 1.0)
+        if not seed.any():
+            return None
+
+        item_scores = similarity.T.dot(seed)
+        nonzero = np.flatnonzero(item_scores)
+        result = np.zeros(n_rows)
+        for col in nonzero:
+            row = row_of.get(int(col_ids[col]))
+            if row is not None:
+                result[row] = item_scores[col]
+        peak = result.max()
+        return result / peak if peak > 0 else None
+
+
+item_similarity = ItemSimilarity()
+
+
+def top_k_rows(scores, eligible, k):
+    """
+    在 eligible 为 True 的行中选出分数最高的 k 行(按分数降序)
+    argpartition 选出候选为 O(n)，只对这 k 行排序，避免对全部文章 argsort
+    """
+    candidates = np.flatnonzero(eligible)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def random_rows(eligible, k):
+    """在 eligible 为 True 的行中随机选 k 行"""
+    candidates = np.flatnonzero(eligible)
+    return np.random.choice(candidates, min(k, len(candidates)), replace=False)
+
+
+def _apply_browse(profile, weights, article_id):
+    """
+    按衰减滑动平均把一次浏览计入兴趣向量：
+    rate = max(1/n, DECAY)，前几次浏览等价于算术平均，之后旧兴趣按指数衰减
+    """
+    vector = recommend_index.snapshot().article_terms(article_id)
+    recent = json.loads(profile.recent_ids or '[]')
+    if article_id in recent:
+        recent.remove(article_id)
+    recent.insert(0, article_id)
+    profile.recent_ids = json.dumps(recent[:current_app.config['RECOMMEND_PROFILE_RECENT']])
+    if vector is None:
+        return weights  # 文章已被屏蔽/删除，不计入兴趣
+
+    profile.browse_count = (profile.browse_count or 0) + 1
+    rate = max(1.0 / profile.browse_count, current_app.config['RECOMMEND_PROFILE_DECAY'])
+    for term in weights:
+        weights[term] *= 1 - rate
+    for term, weight in vector.items():
+        weights[term] = weights.get(term, 0.0) + rate * weight
+    return weights
+
+
+def _store_weights(profile, weights):
+    limit = current_app.config['RECOMMEND_PROFILE_TERMS']
+    if len(weights) > limit:
+        weights = dict(sorted(weights.items(), key=lambda kv: kv[1], reverse=True)[:limit])
+    profile.terms = json.dumps({t: round(w, 5) for t, w in weights.items()}, ensure_ascii=False,
+                               separators=(',', ':'))
+
+
+def record_browse(user_id, article_id):
+    """浏览文章时更新用户兴趣向量(由调用方提交事务)"""
+    profile = UserInterest.query.get(user_id)
+    if profile is None:
+        profile = _bootstrap_profile(user_id)  # 老用户首次更新前先用历史记录初始化
+    weights = _apply_browse(profile, json.loads(profile.terms or '{}'), article_id)
+    _store_weights(profile, weights)
+
+
+def _bootstrap_profile(user_id):
+    """
+    根据已有浏览记录(最近浏览的 RECOMMEND_PROFILE_RECENT 篇文章)初始化兴趣向量，每个用户只执行一次
+    同一用户的并发请求可能同时初始化：在保存点中插入，主键冲突时改用其他请求已写入的记录
+    """
+    profile = UserInterest(user_id=user_id, terms='{}', recent_ids='[]', browse_count=0)
+    records = (UserBrowseLatest.query.with_entities(UserBrowseLatest.article_id)
+               .filter_by(user_id=user_id)
+               .order_by(UserBrowseLatest.browse_time.desc())
+               .limit(current_app.config['RECOMMEND_PROFILE_RECENT']).all())
+    weights = {}
+    for (article_id,) in reversed(records):
+        weights = _apply_browse(profile, weights, article_id)
+    _store_weights(profile, weights)
+    try:
+        with db.session.begin_nested():
+            db.session.add(profile)
+    except IntegrityError:
+        # 加锁读取，读到最新提交的记录(而不是本事务开始时的快照)
+        profile = UserInterest.query.filter_by(user_id=user_id).with_for_update().one()
+    return profile
+
+
+def get_profile(user_id):
+    """
+    返回 (兴趣权重 {词项: 权重}, 最近浏览的文章 ID 列表)；没有任何浏览记录时返回 None
+    推荐时只读一行兴趣记录，与用户浏览过多少文章无关
+    """
+    profile = UserInterest.query.get(user_id)
+    if profile is None:
+        if UserBrowseLatest.query.filter_by(user_id=user_id).first() is None:
+            return None
+        profile = _bootstrap_profile(user_id)
+        db.session.commit()
+    return json.loads(profile.terms or '{}'), json.loads(profile.recent_ids or '[]')
+
+
+def _neighbour_entries(matrix, row_ids, rows, k):
+    """计算 rows 中每篇文章最相似的 k 篇文章，返回可直接批量插入 article_neighbor 的行"""
+    entries = []
+    if not len(rows):
+        return entries
+    sims = (matrix[rows] @ matrix.T).toarray()
+    sims[np.arange(len(rows)), rows] = 0  # 排除自身
+    for i, row in enumerate(rows):
+        for rank, j in enumerate(top_k_rows(sims[i], sims[i] > 0, k)):
+            entries.append({'article_id': int(row_ids[row]), 'neighbor_id': int(row_ids[j]),
+                            'score': round(float(sims[i, j]), 4), 'rank': rank})
+    return entries
+
+
+def drop_neighbours(article_id):
+    """删除与该文章相关的全部相似关系(由调用方提交事务)"""
+    ArticleNeighbor.query.filter(
+        or_(ArticleNeighbor.article_id == article_id, ArticleNeighbor.neighbor_id == article_id)
+    ).delete(synchronize_session=False)
+
+
+_pending_lock = threading.Lock()
+_pending_neighbours = set()  # 待增量重算相似列表的文章 id
+
+
+def queue_neighbours(article_id):
+    """文章创建/修改/状态变化后登记，由后台任务 flush_neighbours 批量重算，写请求中不做全语料库的相似度计算"""
+    with _pending_lock:
+        _pending_neighbours.add(article_id)
+
+
+def flush_neighbours():
+    """重算登记过的文章的相似列表(后台任务)，返回处理的文章数；失败时保留到下次"""
+    with _pending_lock:
+        pending = set(_pending_neighbours)
+        _pending_neighbours.clear()
+    if not pending:
+        return 0
+    try:
+        refresh_neighbours(pending)
+    except Exception:
+        with _pending_lock:
+            _pending_neighbours.update(pending)
+        raise
+    return len(pending)
+
+
+def refresh_neighbours(article_ids, chunk_size=256):
+    """
+    增量更新相似文章表：
+    重算这些文章自己的相似列表，以及原来引用它们、或新近与它们相似的文章的列表
+    """
+    article_ids = set(article_ids)
+    snapshot = recommend_index.snapshot()
+    matrix, row_ids, row_of = snapshot.matrix, snapshot.row_ids, snapshot.row_of
+    k = current_app.config['RECOMMEND_SIMILAR_COUNT']
+    referrers = {aid for (aid,) in db.session.query(ArticleNeighbor.article_id)
+                 .filter(ArticleNeighbor.neighbor_id.in_(article_ids)).all()}
+    for article_id in article_ids:
+        drop_neighbours(article_id)
+
+    def compute(rows):
+        entries = []
+        for start in range(0, len(rows), chunk_size):
+            entries += _neighbour_entries(matrix, row_ids, rows[start:start + chunk_size], k)
+        return entries
+
+    entries = compute([row_of[aid] for aid in article_ids if aid in row_of])
+    referrers |= {e['neighbor_id'] for e in entries}
+    referrers -= article_ids
+    if referrers:
+        ArticleNeighbor.query.filter(ArticleNeighbor.article_id.in_(referrers)).delete(synchronize_session=False)
+        entries += compute([row_of[aid] for aid in referrers if aid in row_of])
+    if entries:
+        db.session.execute(ArticleNeighbor.__table__.insert(), entries)
+    db.session.commit()
+
+
+def rebuild_neighbours(chunk_size=256):
+    """全量重算相似文章表(后台任务)，按块计算避免一次生成 n×n 稠密矩阵"""
+    snapshot = recommend_index.snapshot()
+    matrix, row_ids = snapshot.matrix, snapshot.row_ids
+    k = current_app.config['RECOMMEND_SIMILAR_COUNT']
+    entries = []
+    for start in range(0, len(row_ids), chunk_size):
+        entries += _neighbour_entries(matrix, row_ids, list(range(start, min(start + chunk_size, len(row_ids)))), k)
+    ArticleNeighbor.query.delete(synchronize_session=False)
+    if entries:
+        db.session.execute(ArticleNeighbor.__table__.insert(), entries)
+    db.session.commit()
+    logging.info(f"相似文章表已重建: {len(row_ids)} 篇文章, {len(entries)} 条记录")
+
+
+if __name__ == '__main__':
+    # 排序阶段的微基准：python recommender.py
+    import timeit
+
+    n_articles, n_seen, k = 100_000, 100, 10
+    rng = np.random.default_rng(0)
+    scores = rng.random(n_articles) - 0.2
+    permission = rng.random(n_articles) < 0.05
+    article_ids = list(range(1, n_articles + 1))
+    history = rng.choice(article_ids, n_seen, replace=False).tolist()
+    row_of = {aid: i for i, aid in enumerate(article_ids)}
+
+    def legacy():
+        indices = [article_ids.index(aid) for aid in history if aid in article_ids]
+        result = []
+        for i in scores.argsort()[::-1]:
+            if scores[i] <= 0 or permission[i]:
+                continue
+            result.append(article_ids[i])
+            if len(result) >= k:
+                break
+        return indices, result
+
+    def vectorized():
+        seen = np.zeros(n_articles, dtype=bool)
+        seen[[row_of[aid] for aid in history]] = True
+        eligible = (scores > 0) & ~permission & ~seen
+        return top_k_rows(scores, eligible, k)
+
+    for name, fn in (('argsort + Python loop', legacy), ('mask + argpartition', vectorized)):
+        best = min(timeit.repeat(fn, number=10, repeat=5)) / 10
+        print(f"{name:>22}: {best * 1000:.2f} ms / request ({n_articles} articles)")
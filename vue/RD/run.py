@@ -1,12 +1,18 @@
 from db import User, Article, Manager
 from __init__ import create_app, db
 from datetime import datetime
+from browselog import browse_log, backfill_browse_latest
+from schema import upgrade_schema
+from usercounters import backfill_user_counters
+from tokenblock import backfill_token_expiry
+from timeline import backfill_timelines
 
 app = create_app()
 
 # 创建数据库
 with app.app_context():
     db.create_all()  # 创建所有模型对应的表
+    upgrade_schema()  # 已有的表补上新增的列和索引
 
     # 初始化管理员账户
     if not Manager.query.filter_by(mng_name="aa").first():
@@ -22,6 +28,14 @@ with app.app_context():
         db.session.add(manager0)
         db.session.commit()
 
+    # 升级后首次启动：在浏览记录写入线程启动之前，从原始记录回填 user_browse_latest
+    backfill_browse_latest()
+    backfill_user_counters()
+    backfill_timelines()  # 按粉丝数判断是否写扩散，需在计数列回填之后
+    backfill_token_expiry()
+
+browse_log.start()
+
 if __name__ == '__main__':
     app.run(debug=True)  # 在生产环境中应设置为 False
 
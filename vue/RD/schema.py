@@ -0,0 +1,53 @@
+import logging
+from sqlalchemy import inspect
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateColumn
+from __init__ import db
+
+
+def _missing(table):
+    """已存在的表上缺少的列和索引(表不存在时返回 None，由 create_all 整表创建)"""
+    inspector = inspect(db.engine)
+    if not inspector.has_table(table.name):
+        return None
+    columns = {column['name'] for column in inspector.get_columns(table.name)}
+    indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+    return ([column for column in table.columns if column.name not in columns],
+            [index for index in table.indexes if index.name not in indexes])
+
+
+def upgrade_schema():
+    """
+    create_all 只创建不存在的表，不会修改已有的表；升级后首次启动时在这里补上新增的列和索引
+    - 新增的列必须可为空或带 server_default，已有的行才能取到值
+    - 多个进程同时执行时，失败后重新检查，已被其他进程补上的忽略
+    返回补上的 [(表名, 列名或索引名)]
+    """
+    added = []
+    for table in db.metadata.sorted_tables:
+        missing = _missing(table)
+        if not missing:
+            continue
+        columns, indexes = missing
+        for column in columns:
+            name = db.engine.dialect.identifier_preparer.format_table(table)
+            ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+            try:
+                with db.engine.begin() as conn:
+                    conn.exec_driver_sql(f'ALTER TABLE {name} ADD COLUMN {ddl}')
+            except DBAPIError:
+                if column.name not in {c['name'] for c in inspect(db.engine).get_columns(table.name)}:
+                    raise
+                continue
+            added.append((table.name, column.name))
+        for index in indexes:
+            try:
+                index.create(bind=db.engine)
+            except DBAPIError:
+                if index.name not in {i['name'] for i in inspect(db.engine).get_indexes(table.name)}:
+                    raise
+                continue
+            added.append((table.name, index.name))
+    for table_name, name in added:
+        logging.info(f"数据库结构升级: {table_name}.{name} 已补上")
+    return added
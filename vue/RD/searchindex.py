@@ -0,0 +1,368 @@
+import os
+import re
+import html
+import math
+import heapq
+import pickle
+import atexit
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from sqlalchemy import func, or_
+from __init__ import db
+from db import Article
+from textanalysis import text_analyzer, strip_html
+
+# 各字段的权重(BM25F 的简化形式：按权重合并各字段词频和长度)
+FIELD_BOOSTS = {'title': 2.0, 'tag': 1.5, 'author': 1.0, 'content': 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_WIDTH = 120  # 搜索结果摘要的长度(字符)
+RESYNC_OVERLAP = timedelta(seconds=60)  # 增量同步时回看的时间窗口，覆盖其他进程修改时间早于本进程、但提交较晚的文章
+
+
+def is_searchable(article):
+    """屏蔽(permission=1)或已删除(status=1)的文章不会被搜索到"""
+    return article.permission != 1 and article.status != 1
+
+
+def article_fields(article):
+    return {
+        'title': text_analyzer.analyze(article.title, html_content=False),
+        'tag': text_analyzer.analyze((article.tag or '').replace('，', ' '), html_content=False),
+        'author': text_analyzer.analyze(article.user.username if article.user else '', html_content=False),
+        'content': text_analyzer.analyze(article.content),
+    }
+
+
+class QueryCache:
+    """
+    查询结果缓存：规范化后的查询词 -> (按得分排序的前若干条命中, 命中总数)
+    - LRU 淘汰 + TTL 过期；TTL 兜底文档总数/平均长度变化带来的 BM25 分数漂移
+    - 维护 词项 -> 缓存键 的反向表，文章写入时只失效包含其词项的查询
+    调用方负责加锁(由 SearchIndex.lock 保护)
+    """
+
+    def __init__(self, size=1000, ttl=300, max_hits=500):
+        self.size = size
+        self.ttl = ttl
+        self.max_hits = max_hits  # 每个查询缓存的结果条数上限，翻页超过时不走缓存
+        self.entries = OrderedDict()  # key -> (过期时间, hits, total, 关联词项)
+        self.by_term = {}  # 词项 -> {key}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key, limit):
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            self._drop(key)
+            entry = None
+        if entry is None or (len(entry[1]) < entry[2] and (limit is None or limit > len(entry[1]))):
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1][:limit], entry[2]
+
+    def put(self, key, terms, hits, total):
+        self._drop(key)
+        self.entries[key] = (time.monotonic() + self.ttl, hits[:self.max_hits], total, terms)
+        for term in terms:
+            self.by_term.setdefault(term, set()).add(key)
+        while len(self.entries) > self.size:
+            self._drop(next(iter(self.entries)))
+
+    def invalidate(self, terms):
+        for term in terms:
+            for key in self.by_term.pop(term, ()):
+                if key in self.entries:
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.by_term.clear()
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for term in entry[3]:
+            keys = self.by_term.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_term[term]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self.entries), "capacity": self.size, "ttl": self.ttl, "hits": self.hits,
+                "misses": self.misses, "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations}
+
+
+class SearchIndex:
+    """
+    进程内倒排索引 + BM25 排序
+    - 倒排表：词项 -> {article_id: 加权词频}，只收录可搜索的文章
+    - 文章写入时增量更新，保存在 instance 目录下，启动时加载
+    - 查询只访问查询词的倒排表，耗时与文章表大小无关
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.path = None
+        self.loaded = False
+        self.verified = False  # 本进程内是否已与数据库核对过
+        self.postings = {}  # 词项 -> {article_id: 加权词频}
+        self.doc_terms = {}  # article_id -> 文章包含的词项(删除时用)
+        self.doc_len = {}  # article_id -> 加权文档长度
+        self.total_len = 0.0
+        self.char_terms = {}  # 汉字 -> 包含该字的二元词，用于单字查询
+        self.last_update = None  # 已入索引的最近一次文章修改时间，用于启动时判断索引是否过期
+        self.last_id = 0  # 已入索引的最大文章 id(新建文章没有修改时间)，用于增量同步
+        self.cache = QueryCache()
+
+    def init_app(self, app):
+        self.path = os.path.join(app.instance_path, app.config['SEARCH_INDEX_FILE'])
+        self.cache = QueryCache(app.config['SEARCH_CACHE_SIZE'], app.config['SEARCH_CACHE_TTL'],
+                                app.config['SEARCH_CACHE_MAX_HITS'])
+        self.load()
+        atexit.register(self.save)
+
+    # ---------- 持久化 ----------
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('analyzer') != text_analyzer.signature:
+                return  # 分词规则已变化，首次使用时重建
+            with self.lock:
+                self.postings = state['postings']
+                self.doc_terms = state['doc_terms']
+                self.doc_len = state['doc_len']
+                self.total_len = sum(self.doc_len.values())
+                self.char_terms = state['char_terms']
+                self.last_update = state['last_update']
+                self.last_id = state.get('last_id', 0)
+                self.cache.clear()
+                self.loaded = True
+        except Exception as e:
+            logging.warning(f"加载搜索索引失败，将从数据库重建: {e}")
+
+    def save(self):
+        if not self.path or not self.loaded:
+            return
+        with self.lock:
+            state = {'postings': self.postings, 'doc_terms': self.doc_terms, 'doc_len': self.doc_len,
+                     'char_terms': self.char_terms, 'last_update': self.last_update, 'last_id': self.last_id,
+                     'analyzer': text_analyzer.signature}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+
+    def rebuild(self):
+        """从数据库全量构建索引(仅在索引文件缺失或与数据库不一致时执行)"""
+        with self.lock:
+            self.last_update = db.session.query(func.max(Article.update_time)).scalar()
+            self.last_id = db.session.query(func.max(Article.id)).scalar() or 0
+            self.postings, self.doc_terms, self.doc_len, self.char_terms = {}, {}, {}, {}
+            self.total_len = 0.0
+            self.cache.clear()
+            articles = (Article.query.options(db.joinedload(Article.user))
+                        .filter(Article.permission != 1, Article.status != 1).all())
+            for article in articles:
+                self._add(article)
+            self.loaded = True
+        self.save()
+
+    def ensure_loaded(self):
+        """首次使用时核对索引与数据库中的可见文章是否一致，不一致则重建"""
+        if self.verified:
+            return
+        with self.lock:
+            if self.verified:
+                return
+            if not (self.loaded and self._matches_db()):
+                self.rebuild()
+            self.verified = True
+
+    def _matches_db(self):
+        if db.session.query(func.max(Article.update_time)).scalar() != self.last_update:
+            return False
+        visible = Article.query.with_entities(Article.id).filter(Article.permission != 1, Article.status != 1).all()
+        return {row[0] for row in visible} == set(self.doc_len)
+
+    # ---------- 增量更新 ----------
+    def _add(self, article):
+        weighted = {}
+        length = 0.0
+        for field, tokens in article_fields(article).items():
+            boost = FIELD_BOOSTS[field]
+            length += boost * len(tokens)
+            for term in tokens:
+                weighted[term] = weighted.get(term, 0.0) + boost
+        for term, tf in weighted.items():
+            self.postings.setdefault(term, {})[article.id] = tf
+            if len(term) == 2 and '\u4e00' <= term[0] <= '\u9fff':
+                for ch in term:
+                    self.char_terms.setdefault(ch, set()).add(term)
+        self.doc_terms[article.id] = tuple(weighted)
+        self.doc_len[article.id] = length
+        self.total_len += length
+        self._invalidate(weighted)
+
+    def _remove(self, article_id):
+        terms = self.doc_terms.pop(article_id, None)
+        if terms is None:
+            return
+        self._invalidate(terms)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(article_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_len -= self.doc_len.pop(article_id)
+
+    def _invalidate(self, terms):
+        """文章的词项发生变化：失效命中这些词项(及组成二元词的单字)的缓存查询"""
+        affected = set(terms)
+        affected.update(ch for term in terms if len(term) == 2 and '\u4e00' <= term[0] <= '\u9fff' for ch in term)
+        self.cache.invalidate(affected)
+
+    def upsert(self, article):
+        """文章创建/修改/状态变化后调用：可搜索则(重新)入索引，否则移出索引"""
+        with self.lock:
+            if not self.loaded:
+                return  # 索引尚未建立，首次使用时会全量构建
+            if article.update_time and (self.last_update is None or article.update_time > self.last_update):
+                self.last_update = article.update_time
+            self.last_id = max(self.last_id, article.id)
+            self._remove(article.id)
+            if is_searchable(article):
+                self._add(article)
+
+    def remove(self, article_id):
+        with self.lock:
+            if self.loaded:
+                self._remove(article_id)
+
+    def resync(self):
+        """
+        与数据库增量同步(后台任务)：其他进程写入的文章只更新了那个进程的内存索引
+        - 取回 id 大于 last_id、或修改时间晚于 last_update(回看 RESYNC_OVERLAP)的文章重新入索引
+        - 物理删除不会留下修改时间：可搜索文章数与索引不一致时，核对索引中已不在数据库里的文章并移出
+        返回重新入索引和移出的文章数
+        """
+        if not self.loaded:
+            return 0  # 索引尚未建立，首次使用时会全量构建
+        with self.lock:
+            last_update, last_id = self.last_update, self.last_id
+        if last_update is None:
+            changed = or_(Article.id > last_id, Article.update_time.isnot(None))
+        else:
+            changed = or_(Article.id > last_id, Article.update_time > last_update - RESYNC_OVERLAP)
+        articles = Article.query.options(db.joinedload(Article.user)).filter(changed).all()
+        for article in articles:
+            self.upsert(article)
+
+        visible = (db.session.query(func.count(Article.id))
+                   .filter(Article.permission != 1, Article.status != 1).scalar())
+        with self.lock:
+            indexed = set(self.doc_len)
+        missing = []
+        if visible != len(indexed):
+            ids = {row[0] for row in db.session.query(Article.id).filter(Article.permission != 1, Article.status != 1)}
+            suspects = indexed - ids
+            # 查询之后本进程可能刚写入新文章：逐个确认，仍存在的按当前状态更新，不存在的才移出
+            found = (Article.query.options(db.joinedload(Article.user)).filter(Article.id.in_(suspects)).all()
+                     if suspects else [])
+            for article in found:
+                self.upsert(article)
+            missing = suspects - {article.id for article in found}
+            for article_id in missing:
+                self.remove(article_id)
+        return len(articles) + len(missing)
+
+    # ---------- 查询 ----------
+    def query_terms(self, tokens):
+        """查询词扩展：单个汉字扩展为包含它的二元词"""
+        terms = []
+        for term in tokens:
+            if len(term) == 1 and term in self.char_terms:
+                terms.extend(self.char_terms[term])
+            else:
+                terms.append(term)
+        return terms
+
+    def search(self, keyword, limit=None):
+        """
+        返回 (hits, total)：hits 为按 BM25 得分降序排列的 [(article_id, score)]，total 为命中文章总数
+        指定 limit 时只用堆取出前 limit 个，不对全部命中排序；limit 为 None 时返回全部命中
+        结果按规范化后的查询词(去重、排序)缓存
+        """
+        self.ensure_loaded()
+        key = tuple(sorted(set(text_analyzer.analyze(keyword, html_content=False))))
+        with self.lock:
+            n_docs = len(self.doc_len)
+            if not n_docs or not key:
+                return [], 0
+            cached = self.cache.get(key, limit)
+            if cached is not None:
+                return cached
+            avg_len = self.total_len / n_docs or 1.0
+            scores = {}
+            terms = self.query_terms(key)
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for article_id, tf in posting.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[article_id] / avg_len)
+                    scores[article_id] = scores.get(article_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+            # 至少取够缓存的条数，后续翻页可直接命中缓存
+            n = max(limit, self.cache.max_hits) if limit else None
+            ranked = heapq.nlargest(n, scores.items(), key=lambda kv: kv[1]) if n else \
+                sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+            self.cache.put(key, set(key) | set(terms), ranked, len(scores))
+        return ranked[:limit], len(scores)
+
+
+def highlight_snippet(content, keyword, width=SNIPPET_WIDTH):
+    """
+    从正文的可见文本中截取第一个命中查询词附近的一段作为摘要，命中的词用 <em> 标出
+    返回的是 HTML 片段(其余文本已转义)
+    """
+    text = ' '.join(strip_html(content).split())
+    terms = sorted(set(text_analyzer.analyze(keyword, html_content=False)), key=len, reverse=True)
+    if not terms:
+        return html.escape(text[:width])
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    match = pattern.search(text)
+    start = max(0, match.start() - width // 4) if match else 0
+    excerpt = text[start:start + width]
+
+    parts, pos = [], 0
+    for m in pattern.finditer(excerpt):
+        parts.append(html.escape(excerpt[pos:m.start()]))
+        parts.append('<em>' + html.escape(m.group()) + '</em>')
+        pos = m.end()
+    parts.append(html.escape(excerpt[pos:]))
+    snippet = ''.join(parts)
+    if start > 0:
+        snippet = '…' + snippet
+    if start + width < len(text):
+        snippet += '…'
+    return snippet
+
+
+search_index = SearchIndex()
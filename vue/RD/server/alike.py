@@ -3,6 +3,9 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 from __init__ import db
 from db import Alike, Article
+from hotrank import record_engagement, HOT_EVENT_LIKE
+from sqlalchemy.orm import joinedload
+from pagination import keyset_paginate
 
 alike_bp = Blueprint('alike', __name__)
 
@@ -26,6 +29,7 @@ def like_article(article_id):
     db.session.add(new_like)
     article.like_count += 1
     db.session.commit()
+    record_engagement(article_id, HOT_EVENT_LIKE, new_like.create_time)
     return jsonify({
         "state": 1,
         "message": "Liked successfully",
@@ -48,9 +52,11 @@ def unlike_article(article_id):
             "like_count": article.like_count, # 返回当前点赞数
             "is_liked": False # 返回当前用户未点赞状态
         }), 200 # 200 OK 或 400 Bad Request
+    liked_at = like.create_time
     db.session.delete(like)
     article.like_count = max(0, article.like_count - 1)
     db.session.commit()
+    record_engagement(article_id, HOT_EVENT_LIKE, liked_at, undo=True)
     return jsonify({
         "state": 1,
         "message": "Unliked successfully",
@@ -102,8 +108,9 @@ def get_likers(article_id):
 def get_user_likes():
     user_id = get_jwt_identity()  # 获取当前用户的 ID
 
-    # 获取当前用户所有的点赞记录
-    likes = Alike.query.filter_by(user_id=user_id).all()
+    # 获取当前用户的点赞记录(游标分页，最新优先)，文章和作者一起取回
+    query = Alike.query.filter_by(user_id=user_id).options(joinedload(Alike.article).joinedload(Article.user))
+    likes, next_cursor = keyset_paginate(query, (Alike.create_time, Alike.id))
 
     # 提取点赞文章的详细信息
     liked_articles = []
@@ -122,7 +129,8 @@ def get_user_likes():
     return jsonify({
         "state": 1,
         "message": "User like records fetched successfully",
-        "data": liked_articles
+        "data": liked_articles,
+        "next_cursor": next_cursor
     }), 200
 
 
@@ -1,60 +1,110 @@
 import os
-from flask import jsonify, request, Blueprint
+from flask import jsonify, request, Blueprint, current_app
 from config import Config
 from __init__ import db
-from db import User, Article, Manager, UserBrowseRecord, Alike
+from db import (User, Article, Manager, UserBrowseLatest, ArticleBrowseDaily, Alike, ArticleNeighbor,
+                ReaderSketch, TimelineEntry)
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import functools
 from collections import OrderedDict
 from werkzeug.utils import secure_filename
 from datetime import datetime
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import random
+from recommender import (recommend_index, item_similarity, record_browse, get_profile, top_k_rows, random_rows,
+                         queue_neighbours, drop_neighbours)
+from searchindex import search_index, highlight_snippet
+from suggest import suggest_index
+from readcounter import read_counter
+from browselog import browse_log
+from hll import reader_sketches, SKETCH_ARTICLE
+from adminauth import admin_required, admin_identities  # 管理员权限装饰器
+from hotrank import hot_rank, trending, record_engagement, HOT_EVENT_READ, TRENDING_WINDOWS
+import numpy as np
 import logging
 import requests
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import func, and_
+from sqlalchemy.orm import contains_eager, joinedload
+from pagination import keyset_paginate, list_response
+from timeline import fanout_article
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 artical_bp = Blueprint('artical', __name__)
 
-# 管理员权限装饰器
-def admin_required(f):
-    @jwt_required()
-    @functools.wraps(f)
-    def decorated_function(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        admin = Manager.query.filter_by(mng_id=current_user_id).first()
-        if not admin:
-            return jsonify({"error": "管理员身份验证失败"}), 403
-        return f(*args, **kwargs)
-
-    return decorated_function
-
-
 def get_article_or_404(article_id):
     """获取文章对象,如果不存在则返回404"""
     article = Article.query.get_or_404(article_id)
     return article
 
-def get_browses(user_id):
-    records = UserBrowseRecord.query.filter_by(user_id=user_id).order_by(UserBrowseRecord.browse_time.desc()).all()
-    article_ids = [record.article_id for record in records]
-    return article_ids  # ✅ 返回纯数据列表
+def sync_article_index(article):
+    """文章创建、修改或状态/权限变化后，增量更新推荐索引、搜索索引、热门/趋势榜、搜索建议，相似文章表交给后台任务重算"""
+    recommend_index.upsert(article)
+    search_index.upsert(article)
+    hot_rank.upsert(article)
+    trending.upsert(article)
+    suggest_index.upsert(article)
+    queue_neighbours(article.id)
+
+
+# 管理端文章列表可排序的字段
+ADMIN_ARTICLE_SORTS = ('id', 'create_time', 'read_count', 'comments_count', 'likes_count', 'favorites_count')
 
 
 # 获取所有文章列表（管理员专用）
+# 可选参数：status、permission、tag(包含匹配) 过滤；sort(见 ADMIN_ARTICLE_SORTS)、order(asc/desc) 排序；
+#         page、per_page 分页(不传 page 时返回全部)
 @artical_bp.route('/manager/article_list', methods=['GET'])
 @admin_required
 def get_all_articles():
-    articles = Article.query.all()
-    articles_list = [article.mng_to_dict() for article in articles]
-    return jsonify({
+    status = request.args.get('status', type=int)
+    permission = request.args.get('permission', type=int)
+    tag = request.args.get('tag', '').strip()
+    sort = request.args.get('sort', 'id')
+    order = request.args.get('order', 'desc' if sort != 'id' else 'asc')
+    if sort not in ADMIN_ARTICLE_SORTS or order not in ('asc', 'desc'):
+        return jsonify({"state": 0, "message": "Invalid sort parameter"}), 400
+
+    # 评论/点赞/收藏数用按文章分组的聚合子查询左连接，作者用连接一起取回，整页只需一条查询
+    counts = Article.count_subqueries()
+    count_columns = [func.coalesce(sub.c.n, 0).label(name) for name, sub in counts.items()]
+    query = (db.session.query(Article, *count_columns)
+             .join(Article.user).options(contains_eager(Article.user)))
+    for sub in counts.values():
+        query = query.outerjoin(sub, sub.c.article_id == Article.id)
+    if status is not None:
+        query = query.filter(Article.status == status)
+    if permission is not None:
+        query = query.filter(Article.permission == permission)
+    if tag:
+        query = query.filter(Article.tag.contains(tag))
+
+    sort_column = dict(zip(counts, count_columns)).get(sort, getattr(Article, sort, None))
+    sort_column = sort_column.desc() if order == 'desc' else sort_column.asc()
+    query = query.order_by(sort_column, Article.id.desc() if order == 'desc' else Article.id.asc())
+
+    page = request.args.get('page', type=int)
+    pagination = None
+    if page:
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)  # 每页20条，最多100条
+        pagination = query.paginate(page=max(page, 1), per_page=per_page, error_out=False)
+        rows = pagination.items
+    else:
+        rows = query.all()
+
+    unique_readers = reader_sketches.unique_readers(SKETCH_ARTICLE, [row[0].id for row in rows])
+    articles_list = []
+    for article, *values in rows:
+        article_data = article.mng_to_dict(dict(zip(counts, values)))
+        article_data['unique_readers'] = unique_readers[article.id]  # 独立读者数(近似值)
+        articles_list.append(article_data)
+    result = {
         "state": 1,
         "message": "List of articles",
         "articles": articles_list
-    })
+    }
+    if pagination is not None:
+        result.update({"total_pages": pagination.pages, "total_items": pagination.total,
+                       "current_page": pagination.page, "per_page": pagination.per_page})
+    return jsonify(result)
 
 
 # 获取特定文章详情（管理员专用）
@@ -62,7 +112,9 @@ def get_all_articles():
 @admin_required
 def get_article_detail(article_id):
     article = get_article_or_404(article_id)
-    return jsonify({"state": 1, "message": "detailss of article", "article": article.to_dict()})
+    article_data = article.to_dict()
+    article_data['unique_readers'] = reader_sketches.unique_readers_of(SKETCH_ARTICLE, article_id)
+    return jsonify({"state": 1, "message": "detailss of article", "article": article_data})
 
 
 # 修改文章状态（管理员专用）
@@ -75,6 +127,7 @@ def change_article_status_by_admin(article_id):
         return jsonify({"error": "无效的状态值"}), 400
 
     article.set_status(new_status)
+    sync_article_index(article)
     return jsonify({
         "state": 1,
         "message": "文章状态更新成功",
@@ -92,6 +145,7 @@ def change_article_permission_by_admin(article_id):
         return jsonify({"error": "无效的权限值"}), 400
 
     article.set_permission(new_permission)
+    sync_article_index(article)
     return jsonify({
         "state": 1,
         "message": "文章权限更新成功",
@@ -105,8 +159,19 @@ def change_article_permission_by_admin(article_id):
 def delete_article_physically(article_id):
     article = get_article_or_404(article_id)
     try:
+        drop_neighbours(article_id)
+        UserBrowseLatest.query.filter_by(article_id=article_id).delete()
+        ArticleBrowseDaily.query.filter_by(article_id=article_id).delete()
+        ReaderSketch.query.filter_by(kind=SKETCH_ARTICLE, target_id=article_id).delete()
+        TimelineEntry.query.filter_by(article_id=article_id).delete()
+        User.bump_counters(article.user_id, article_count=-1)
         db.session.delete(article)
         db.session.commit()
+        recommend_index.remove(article_id)
+        search_index.remove(article_id)
+        hot_rank.remove(article_id)
+        trending.remove(article_id)
+        suggest_index.remove(article_id)
         return jsonify({"message": "文章已删除"}), 200
     except Exception as e:
         db.session.rollback()
@@ -123,6 +188,7 @@ def soft_delete_article(article_id):
     try:
         article.status = 1  # 假设1表示已删除
         db.session.commit()
+        sync_article_index(article)
         return jsonify({
             "message": "文章已软删除",
             "article_id": article.id,
@@ -183,15 +249,19 @@ def create_article():
     )
 
     db.session.add(new_article)
+    User.bump_counters(current_user_id, article_count=1)
     db.session.commit()
+    sync_article_index(new_article)
+    fanout_article(new_article)  # 写入粉丝的关注动态时间线
 
     return jsonify({"state": 1, "message": "Article created successfully", "article_id": new_article.id}), 201
 
 #根据tag获取文章
 @artical_bp.route('/articles/by_tag/<string:tag>', methods=['GET'])
 def get_articles_by_tag(tag):
-    articles = Article.query.filter_by(tag=tag).all()
-    return jsonify([article.to_dict() for article in articles])
+    query = Article.query.filter_by(tag=tag).options(joinedload(Article.user))
+    articles, next_cursor = keyset_paginate(query, (Article.create_time, Article.id))  # 游标在响应头 X-Next-Cursor 中
+    return list_response([article.to_dict() for article in articles], next_cursor)
 
 
 # 获取特定用户文章列表（管理员和用户均可）
@@ -205,16 +275,18 @@ def get_articles():
 
     if user_id:
         #  管理员查看指定用户的文章
-        current_manager = Manager.query.get(current_user_id)
+        current_manager = admin_identities.get(current_user_id)
         if not current_manager:
             return jsonify({"state": 0, "message": "权限不足，无法查看其他用户的文章"}), 403
 
-        articles = Article.query.filter_by(user_id=user_id).all()
+        query = Article.query.filter_by(user_id=user_id)
     else:
         # 普通用户查看自己的文章
-        articles = Article.query.filter_by(user_id=current_user_id).all()
+        query = Article.query.filter_by(user_id=current_user_id)
 
-    return jsonify([article.to_dict() for article in articles])
+    # 游标分页(最新优先)，下一页游标在响应头 X-Next-Cursor 中
+    articles, next_cursor = keyset_paginate(query.options(joinedload(Article.user)), (Article.create_time, Article.id))
+    return list_response([article.to_dict() for article in articles], next_cursor)
 
 
 #更新文章，加上了图片更新和tag功能
@@ -241,6 +313,7 @@ def update_article_by_user(article_id):
 
     # 更新文章
     article.update_article(new_title, new_content, new_permission, new_tag=new_tag,)
+    sync_article_index(article)
 
     return jsonify(article.to_dict())
 
@@ -260,6 +333,7 @@ def delete_article_by_user(article_id):
 
     try:
         article.delete_article()
+        sync_article_index(article)
         return jsonify({'message': 'Article deleted successfully'})
     except Exception as e:
         return jsonify({"error": f"删除文章时出错: {str(e)}"}), 500
@@ -272,16 +346,18 @@ def get_article_content(article_id):
     article = get_article_or_404(article_id)
     if not article:
         return jsonify({"state": 0, "message": "Article not found"}), 404
-    # 更新阅读量
-    article.read_count = article.read_count + 1
-    new_record = UserBrowseRecord(
-        user_id=current_user_id,
-        article_id=article_id,
-        browse_time=datetime.utcnow()
-    )
-    db.session.add(new_record)
+    record_browse(int(current_user_id), article_id)  # 更新兴趣向量，需在写入本次浏览记录之前
     db.session.commit()
-    return jsonify({"state": 1, "message": "details of article", "article": article.to_dict()})
+    # 浏览记录放入队列，由后台线程批量写入
+    browse_log.submit(current_user_id, article_id, datetime.utcnow())
+    # 阅读量先累加在内存中，由 read_counter 批量写回
+    read_counter.add(article_id)
+    record_engagement(article_id, HOT_EVENT_READ)
+    reader_sketches.add_view(article_id, article.user_id, int(current_user_id))
+    article_data = article.to_dict()
+    article_data['read_count'] = read_counter.read_count(article)
+    article_data['unique_readers'] = reader_sketches.unique_readers_of(SKETCH_ARTICLE, article_id)  # 独立读者数(近似值)
+    return jsonify({"state": 1, "message": "details of article", "article": article_data})
 
 
 
@@ -291,28 +367,12 @@ def get_user_browses():
     current_user_id = get_jwt_identity()
     user_id = int(current_user_id)
 
-    # 子查询：查出用户每篇文章浏览的最新时间
-    subquery = (
-        db.session.query(
-            UserBrowseRecord.article_id,
-            func.max(UserBrowseRecord.browse_time).label("latest_browse_time")
-        )
-        .filter(UserBrowseRecord.user_id == user_id)
-        .group_by(UserBrowseRecord.article_id)
-        .subquery()
-    )
-
-    # 主查询：根据子查询结果获取最新的记录
+    # 每篇文章只有一行最新浏览记录(user_browse_latest)，按浏览时间倒序
     records = (
-        db.session.query(UserBrowseRecord)
-        .join(
-            subquery,
-            and_(
-                UserBrowseRecord.article_id == subquery.c.article_id,
-                UserBrowseRecord.browse_time == subquery.c.latest_browse_time
-            )
-        )
-        .order_by(UserBrowseRecord.browse_time.desc())
+        UserBrowseLatest.query
+        .options(db.joinedload(UserBrowseLatest.article).joinedload(Article.user))
+        .filter(UserBrowseLatest.user_id == user_id)
+        .order_by(UserBrowseLatest.browse_time.desc())
         .all()
     )
 
@@ -336,117 +396,107 @@ def get_user_browses():
     })
 
 
+def to_recommend_item(article, score):
+    return OrderedDict([
+        ("article_id", article.id),
+        ("userId", article.user_id),
+        ("title", article.title),
+        ("content", article.content),
+        ("tags", article.tag.split('，') if article.tag else []),  # 直接使用 article.tag 并分割
+        ("user", {"id": article.user.id, "username": article.user.username} if article.user else None),
+        ("authorName", article.user.username if article.user else None),  # 使用 user.username
+        ("createdAt", article.create_time.isoformat()),
+        ("views", read_counter.read_count(article)),
+        ("likes", len(getattr(article, 'likes', []))),  # 假设有点赞关系
+        ("score", score)
+    ])
+
+
 @artical_bp.route('/article/recommend', methods=['GET'])
 @jwt_required()
 def recommend_articles():
     user_id = get_jwt_identity()
     top_k = 10
 
-    count = 0
-    user_history_ids = get_browses(user_id)
-    articles = Article.query.all()
-    article_data = []
-    article_texts = []
-    article_ids = []
-    for article in articles:
-        if article.permission == 1 or article.status == 1:  # 如果文章被屏蔽，则跳过
-            continue
-        article_data.append(article)
-        article_texts.append(article.title + " " + article.content)
-        article_ids.append(article.id)
-    rec_list = []
-
-    if not user_history_ids:
-        remaining = [a for a in article_data]
-        random.shuffle(remaining)  # 或可按创建时间倒序等方式排序
-        for article in remaining:
-            rec_list.append(OrderedDict([
-                ("article_id", article.id),
-                ("userId", article.user_id),
-                ("title", article.title),
-                ("content", article.content),
-                ("tags", article.tag.split('，') if article.tag else []),  # 直接使用 article.tag 并分割
-                ("user", {"id": article.user.id, "username": article.user.username} if article.user else None),
-                ("authorName", article.user.username if article.user else None),  # 使用 user.username
-                ("createdAt", article.create_time.isoformat()),
-                ("views", article.read_count),
-                ("likes", len(getattr(article, 'likes', []))),  # 假设有点赞关系
-                ("score", 0)  # 无相似度，打分为 0
-            ]))
-            count += 1
-            if count >= top_k:
-                break
-        return jsonify({"state": 1, "message": "推荐文章列表", "recommendations": rec_list})
-
-    vectorizer = TfidfVectorizer()
-    tfidf_matrix = vectorizer.fit_transform(article_texts)
-
-    indices = [article_ids.index(aid) for aid in user_history_ids if aid in article_ids]
-    if not indices:
+    # 使用持久化的增量索引，请求中不再重新 fit TfidfVectorizer；整个请求只取一次快照，避免并发更新导致维度不一致
+    snapshot = recommend_index.snapshot()
+    tfidf_matrix, article_ids, row_of = snapshot.matrix, snapshot.row_ids, snapshot.row_of
+    # 读取预先维护的兴趣向量，而不是每次加载全部浏览历史求平均
+    profile = get_profile(int(user_id))
+    user_history_ids = profile[1] if profile else []
+
+    # 候选掩码：索引中只有可见文章(permission/status 已在入索引时过滤)，这里再排除已读文章
+    eligible = ~snapshot.rows_mask(user_history_ids)
+    scored = []  # [(article_id, score)]
+
+    # 内容相似度：兴趣向量与文章 TF-IDF 向量的余弦相似度
+    sim_scores = np.zeros(len(article_ids))
+    if profile:
+        user_vector = snapshot.user_vector(profile[0])
+        norm = np.linalg.norm(user_vector)
+        if norm:
+            # 文档向量已做 L2 归一化，点积除以用户向量模长即为余弦相似度
+            sim_scores = tfidf_matrix.dot(user_vector) / norm
+
+    # 协同过滤得分(后台预计算的文章相似度)，与内容相似度加权混合
+    cf_scores = item_similarity.scores(int(user_id), user_history_ids, row_of, len(article_ids))
+    if cf_scores is not None:
+        cf_weight = current_app.config['RECOMMEND_CF_WEIGHT']
+        sim_scores = (1 - cf_weight) * sim_scores + cf_weight * cf_scores
+    elif profile and not sim_scores.any():
         return jsonify({"state": 0, "message": "用户浏览历史文章不在库中"}), 200
 
-    user_vector = tfidf_matrix[indices].mean(axis=0).A1
-    sim_scores = cosine_similarity(tfidf_matrix, user_vector.reshape(1, -1)).flatten()
+    # 获取 Top-K 推荐索引(O(n) argpartition)
+    for i in top_k_rows(sim_scores, eligible & (sim_scores > 0), top_k):
+        scored.append((int(article_ids[i]), round(float(sim_scores[i]), 4)))
+        eligible[i] = False
 
-    # 排除已读文章
-    # for idx in indices:
-    #    sim_scores[idx] = -1
+    # 补足推荐不足的情况（无浏览历史时全部随机）
+    if len(scored) < top_k:
+        for i in random_rows(eligible, top_k - len(scored)):
+            scored.append((int(article_ids[i]), 0))  # 无相似度，打分为 0
 
-    # 获取 Top-K 推荐索引
-    top_indices = sim_scores.argsort()[::-1]
+    # 只加载最终入选的文章
+    articles = {a.id: a for a in Article.query.filter(Article.id.in_([aid for aid, _ in scored])).all()}
+    rec_list = [to_recommend_item(articles[aid], score) for aid, score in scored if aid in articles]
 
-    used_ids = set(user_history_ids)
+    return jsonify({"state": 1, "message": "推荐文章列表", "recommendations": rec_list})
 
-    for i in top_indices:
-        if sim_scores[i] <= 0:
-            continue
-        article = article_data[i]
-        if article.permission == 1:  # 如果文章被屏蔽，则跳过
-            continue
-        rec_list.append(OrderedDict([
-            ("article_id", article.id),
-            ("userId", article.user_id),
-            ("title", article.title),
-            ("content", article.content),
-            ("tags", article.tag.split('，') if article.tag else []),  # 直接使用 article.tag 并分割
-            ("user", {"id": article.user.id, "username": article.user.username} if article.user else None),
-            ("authorName", article.user.username if article.user else None),  # 使用 user.username
-            ("createdAt", article.create_time.isoformat()),
-            ("views", article.read_count),
-            ("likes", len(getattr(article, 'likes', []))),  # 假设有点赞关系
-            ("score", round(sim_scores[i], 4))
-        ]))
-        used_ids.add(article_ids[i])
-        count += 1
-        if count >= top_k:
-            break
-
-    # 补足推荐不足的情况
-    if count < top_k:
-        remaining = [a for a in article_data if a.id not in used_ids]
-        random.shuffle(remaining)  # 或可按创建时间倒序等方式排序
-        for article in remaining:
-            if article.permission == 1 or article.status == 1:  # 如果文章被屏蔽，则跳过
-                continue
-            rec_list.append(OrderedDict([
-                ("article_id", article.id),
-                ("userId", article.user_id),
-                ("title", article.title),
-                ("content", article.content),
-                ("tags", article.tag.split('，') if article.tag else []),  # 直接使用 article.tag 并分割
-                ("user", {"id": article.user.id, "username": article.user.username} if article.user else None),
-                ("authorName", article.user.username if article.user else None),  # 使用 user.username
-                ("createdAt", article.create_time.isoformat()),
-                ("views", article.read_count),
-                ("likes", len(getattr(article, 'likes', []))),  # 假设有点赞关系
-                ("score", 0)  # 无相似度，打分为 0
-            ]))
-            count += 1
-            if count >= top_k:
-                break
 
-    return jsonify({"state": 1, "message": "推荐文章列表", "recommendations": rec_list})
 
+# 相关文章("更多类似")：直接查询预先计算的相似文章表
+@artical_bp.route('/article/<int:article_id>/similar', methods=['GET'])
+def similar_articles(article_id):
+    article = get_article_or_404(article_id)
+
+    neighbours = (ArticleNeighbor.query
+                  .join(Article, ArticleNeighbor.neighbor_id == Article.id)
+                  .filter(ArticleNeighbor.article_id == article_id, Article.permission != 1, Article.status != 1)
+                  .options(db.joinedload(ArticleNeighbor.neighbor).joinedload(Article.user))
+                  .order_by(ArticleNeighbor.rank)
+                  .all())
+    if not neighbours and article.permission != 1 and article.status != 1:
+        # 后台全量计算之前新出现的文章：登记给后台任务补算，本次返回空列表(请求中不做相似度计算)
+        queue_neighbours(article.id)
+
+    result = []
+    for nb in neighbours:
+        art = nb.neighbor
+        result.append(OrderedDict([
+            ("id", art.id),
+            ("userId", art.user_id),
+            ("title", art.title),
+            ("content", art.content),
+            ("tags", art.tag.split('，') if art.tag else []),
+            ("user", {"id": art.user.id, "username": art.user.username} if art.user else None),
+            ("authorName", art.user.username if art.user else None),
+            ("createdAt", art.create_time.isoformat()),
+            ("views", read_counter.read_count(art)),
+            ("likes", art.like_count),
+            ("similarity", nb.score)
+        ]))
+
+    return jsonify({"state": 1, "message": "相似文章列表", "articles": result}), 200
 
 
 @artical_bp.route('/article/search', methods=['GET'])
@@ -455,83 +505,81 @@ def search_articles():
     if not keyword:
         return jsonify({"state": 0, "message": "请输入搜索关键词"}), 400
 
-    # 1. 查询相关文章
-    # 可以根据标题、内容、作者、标签等进行模糊搜索
-    # 增加了对 permission 字段的判断，屏蔽的文章不会被搜索到
-    articles = Article.query.filter(
-        (Article.title.ilike(f'%{keyword}%')) |
-        (Article.content.ilike(f'%{keyword}%')) |
-        (Article.tag.ilike(f'%{keyword}%')) |
-        (Article.user.has(User.username.ilike(f'%{keyword}%')))  # 搜索作者用户名
-    ).filter(Article.permission != 1).filter(Article.status != 1).all()
+    # 1. 在倒排索引中检索(BM25 排序)，索引只收录未屏蔽、未删除的文章
+    if 'page' in request.args or 'per_page' in request.args:
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 10, type=int), 1), 50)  # 每页10条，最多50条
+        # 只取到当前页为止的前 page * per_page 个结果，同时得到命中总数
+        hits, total = search_index.search(keyword, limit=page * per_page)
+        hits = hits[(page - 1) * per_page:]
+    else:
+        # 未传分页参数时返回全部命中(兼容不翻页的客户端)
+        hits, total = search_index.search(keyword)
+        page, per_page = 1, max(total, 1)
+    total_pages = (total + per_page - 1) // per_page
+    if not hits:
+        return jsonify({"state": 1, "message": "没有找到相关的文章", "data": [], "total_items": total,
+                        "total_pages": total_pages, "current_page": page, "per_page": per_page})
+
+    # 2. 只加载当前页的文章，按相关性顺序返回；snippet 为命中位置附近的摘要
+    article_ids = [article_id for article_id, _ in hits]
+    articles = {article.id: article for article in
+                Article.query.options(db.joinedload(Article.user)).filter(Article.id.in_(article_ids)).all()}
 
     results = []
-    for article in articles:
+    for article_id, score in hits:
+        article = articles.get(article_id)
+        if article is None:
+            continue
         results.append(OrderedDict([
             ("id", article.id),
             ("userId", article.user_id),
             ("title", article.title),
-            ("content", article.content),
+            ("content", article.content),  # 前端卡片按正文生成预览
+            ("snippet", highlight_snippet(article.content, keyword)),
             ("tags", article.tag.split('，') if article.tag else []),
             ("user", {"id": article.user.id, "username": article.user.username} if article.user else None),
             ("authorName", article.user.username if article.user else None),
             ("createdAt", article.create_time.isoformat()),
-            ("views", article.read_count),
-            ("likes", len(getattr(article, 'likes', []))),
-            ("relevance", 1)  # 初始相关性，后续可以根据更复杂的算法调整
+            ("views", read_counter.read_count(article)),
+            ("likes", article.like_count or 0),
+            ("relevance", round(score, 4))
         ]))
 
-    if not results:
-        return jsonify({"state": 1, "message": "没有找到相关的文章", "data": []})
+    return jsonify({"state": 1, "message": "搜索结果", "data": results, "total_items": total,
+                    "total_pages": total_pages, "current_page": page, "per_page": per_page})
 
-    # 2. （可选）提升搜索结果的相关性排序
-    # 简单的基于标题和内容匹配的排序（可以根据需求扩展）
-    def calculate_relevance(article_data):
-        score = 0
-        if keyword.lower() in article_data['title'].lower():
-            score += 2
-        if keyword.lower() in article_data['content'].lower():
-            score += 1
-        # 可以添加基于标签、作者等匹配的评分
-        return score
 
-    for result in results:
-        result['relevance'] = calculate_relevance(result)
-
-    results.sort(key=lambda x: x['relevance'], reverse=True)
-
-    return jsonify({"state": 1, "message": "搜索结果", "data": results})
 
+# 搜索建议(输入联想)：按前缀匹配文章标题、标签和作者，按热度排序
+@artical_bp.route('/article/suggest', methods=['GET'])
+def suggest_articles():
+    prefix = request.args.get('search', '')
+    limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+    suggestions = [OrderedDict([("text", text), ("type", kind), ("id", ref)])
+                   for _, text, kind, ref in suggest_index.suggest(prefix, limit)]
+    return jsonify({"state": 1, "message": "搜索建议", "suggestions": suggestions})
 
 
 @artical_bp.route('/article/hot', methods=['GET'])
 def hot_articles():
     top_k = 10  # 返回前10个热度最高的文章
-    a, b = 3, 1  # 点赞权重3，阅读权重1
 
-    # 查询所有未被屏蔽的文章
-    articles = Article.query.filter(Article.permission != 1, Article.status != 1).all()
+    # 热度(阅读、点赞、收藏、评论按时间衰减累加)由 hot_rank 维护，这里只读取排好序的前 top_k 篇
+    top = hot_rank.top_articles(top_k)
+    articles = {article.id: article for article in
+                Article.query.options(db.joinedload(Article.user))
+                .filter(Article.id.in_([article_id for article_id, _ in top]))
+                .filter(Article.permission != 1, Article.status != 1).all()}
     if not articles:
         return jsonify({"state": 0, "message": "暂无文章数据"}), 200
 
-    # 计算热度分数
-    articles_with_scores = []
-    for article in articles:
-        article_id = getattr(article, 'id', 0)
-        like_num = Alike.query.filter_by(article_id=article_id).count()
-        read_num = getattr(article, 'read_count', 0) or 0
-        score = a * like_num + b * read_num
-        articles_with_scores.append((article, score))
-
-    # 按热度降序排序
-    articles_with_scores.sort(key=lambda x: x[1], reverse=True)
-
-    # 取 top_k
-    top_articles_with_scores = articles_with_scores[:top_k]
-
     # 构造返回结果，包含文章详细信息
     result = []
-    for art, score in top_articles_with_scores:
+    for article_id, score in top:
+        art = articles.get(article_id)
+        if art is None:
+            continue
         result.append(OrderedDict([
             ("id", art.id),
             ("userId", art.user_id),
@@ -541,12 +589,61 @@ def hot_articles():
             ("user", {"id": art.user.id, "username": art.user.username} if art.user else None),
             ("authorName", art.user.username if art.user else None),
             ("createdAt", art.create_time.isoformat()),
-            ("views", art.read_count),
-            ("likes", len(getattr(art, 'likes', []))),
-            ("hot_score", score)  # 添加热度分数
+            ("views", read_counter.read_count(art)),
+            ("likes", art.like_count or 0),
+            ("hot_score", round(score, 2))  # 添加热度分数
         ]))
 
     return jsonify({"state": 1, "message": "热门文章列表", "articles": result}), 200
+
+
+# 趋势榜：今日(window=day)/本周(window=week)互动最多的文章，可按标签筛选
+@artical_bp.route('/article/trending', methods=['GET'])
+def trending_articles():
+    window = request.args.get('window', 'day')
+    tag = request.args.get('tag') or None
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    if window not in TRENDING_WINDOWS:
+        return jsonify({"state": 0, "message": "window 只能是 day 或 week"}), 400
+
+    board = trending.leaderboard(window, tag, limit)
+    articles = {article.id: article for article in
+                Article.query.options(db.joinedload(Article.user))
+                .filter(Article.id.in_([article_id for article_id, _ in board]))
+                .filter(Article.permission != 1, Article.status != 1).all()}
+
+    result = []
+    for article_id, score in board:
+        art = articles.get(article_id)
+        if art is None:
+            continue
+        result.append(OrderedDict([
+            ("id", art.id),
+            ("userId", art.user_id),
+            ("title", art.title),
+            ("tags", art.tag.split('，') if art.tag else []),
+            ("authorName", art.user.username if art.user else None),
+            ("createdAt", art.create_time.isoformat()),
+            ("views", read_counter.read_count(art)),
+            ("likes", art.like_count or 0),
+            ("trend_score", round(score, 2))
+        ]))
+
+    return jsonify({"state": 1, "message": "趋势文章列表", "window": window, "tag": tag, "articles": result}), 200
+
+
+# 趋势标签：窗口内互动最多的标签
+@artical_bp.route('/article/trending/tags', methods=['GET'])
+def trending_tags():
+    window = request.args.get('window', 'day')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    if window not in TRENDING_WINDOWS:
+        return jsonify({"state": 0, "message": "window 只能是 day 或 week"}), 400
+
+    tags = [{"tag": tag, "trend_score": round(score, 2)} for tag, score in trending.top_tags(window, limit)]
+    return jsonify({"state": 1, "message": "趋势标签列表", "window": window, "tags": tags}), 200
+
+
 # 定义获取指定用户文章列表的路由
 @artical_bp.route('/article/list/by-user/<int:user_id>', methods=['GET'])
 # 使用 optional=True，表示这个接口可以带 JWT 访问，也可以不带
@@ -567,8 +664,8 @@ def get_user_articles(user_id):
     # 否则 (else)，说明 current_user_id == user_id，即访问者是作者本人
     # 作者本人可以看到自己的所有文章，不需要额外的 permission 过滤
 
-    # 对文章按创建时间倒序排序（通常是这样）
-    articles = query.order_by(Article.create_time.desc()).all()
+    # 对文章按创建时间倒序排序（通常是这样），游标分页
+    articles, next_cursor = keyset_paginate(query, (Article.create_time, Article.id))
 
     # 准备返回的文章列表数据
     articles_list = []
@@ -586,7 +683,7 @@ def get_user_articles(user_id):
     print(f"Debug: User ID: {user_id}, Current User ID: {current_user_id}")
     print(f"Debug: Final articles_list count: {len(articles_list)}")
     print(f"Debug: Final articles_list content: {articles_list}")  # 打印列表内容看是否为空或包含预期文章
-    return jsonify({"data": articles_list}), 200
+    return jsonify({"data": articles_list, "next_cursor": next_cursor}), 200
 
 # ai 请求
 @artical_bp.route('/article/aichat', methods=['POST'])
@@ -2,6 +2,9 @@ from flask import jsonify, request, Blueprint
 from config import Config
 from __init__ import db
 from db import User, Article, Manager, Comment, CommentLike, ArticleFavorite
+from hotrank import record_engagement, HOT_EVENT_FAVORITE
+from sqlalchemy.orm import joinedload
+from pagination import keyset_paginate
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import functools
 from collections import OrderedDict
@@ -28,6 +31,7 @@ def favorite_article(article_id):
     db.session.add(new_favorite)
     article.favorite_count += 1
     db.session.commit()
+    record_engagement(article_id, HOT_EVENT_FAVORITE)
     return jsonify({
         "state": 1,
         "message": "Article favorited successfully",
@@ -52,9 +56,11 @@ def unfavorite_article(article_id):
             "favorite_count": article.favorite_count, # 返回当前收藏数
             "is_favorited": False # 返回当前用户未收藏状态
         }), 200 # 200 OK 或 400 Bad Request
+    favorited_at = existing_favorite.create_time
     db.session.delete(existing_favorite)
     article.favorite_count = max(0, article.favorite_count - 1)
     db.session.commit()
+    record_engagement(article_id, HOT_EVENT_FAVORITE, favorited_at, undo=True)
     return jsonify({
         "state": 1,
         "message": "Article unfavorited successfully",
@@ -67,7 +73,10 @@ def unfavorite_article(article_id):
 @jwt_required()
 def get_user_favorites():
     user_id = get_jwt_identity()  # 获取当前用户的 ID
-    favorites = ArticleFavorite.query.filter_by(user_id=user_id).all()
+    # 游标分页(最新优先)，文章和作者一起取回
+    query = (ArticleFavorite.query.filter_by(user_id=user_id)
+             .options(joinedload(ArticleFavorite.article).joinedload(Article.user)))
+    favorites, next_cursor = keyset_paginate(query, (ArticleFavorite.create_time, ArticleFavorite.id))
 
     # 提取点赞文章的详细信息
     favorites_articles = []
@@ -86,7 +95,8 @@ def get_user_favorites():
     return jsonify({
         "state": 1,
         "message": "User like records fetched successfully",
-        "data": favorites_articles
+        "data": favorites_articles,
+        "next_cursor": next_cursor
     }), 200
 
 #获取某个文章的收藏数
@@ -6,6 +6,8 @@ from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_req
 import functools
 from collections import OrderedDict
 from sqlalchemy import or_
+from hotrank import record_engagement, HOT_EVENT_COMMENT
+from pagination import keyset_paginate
 
 comment_bp = Blueprint('comment', __name__)
 
@@ -54,9 +56,11 @@ def create_comment(article_id):
     if parent_comment:
         parent_comment.reply_count += 1
         db.session.add(parent_comment)
+    User.bump_counters(user_id, comment_count=1)
 
         # 提交数据库会话
     db.session.commit()
+    record_engagement(article_id, HOT_EVENT_COMMENT)
 
     return jsonify({"state": 1, "message": "Comment created successfully", "comment_id": new_comment.id})
 
@@ -110,9 +114,14 @@ def delete_comment(comment_id):
             parent_comment.reply_count -= 1
             db.session.add(parent_comment)
 
-    # 删除评论
+    # 删除评论(正常显示的评论计入过文章热度，需撤销)
+    counted = comment.status in (0, 3)
+    article_id, commented_at = comment.article_id, comment.create_time
     db.session.delete(comment)
+    User.bump_counters(user_id, comment_count=-1)
     db.session.commit()
+    if counted:
+        record_engagement(article_id, HOT_EVENT_COMMENT, commented_at, undo=True)
 
     # 返回成功响应
     return jsonify({"state": 1, "message": "Comment deleted successfully"})
@@ -135,8 +144,8 @@ def get_user_comments():
     user_id = get_jwt_identity()
     user_id = int(user_id)  # 确保 user_id 是整数类型
 
-    # 获取当前用户发布的所有评论
-    comments = Comment.query.filter_by(user_id=user_id).all()
+    # 获取当前用户发布的评论(游标分页，最新优先)
+    comments, next_cursor = keyset_paginate(Comment.query.filter_by(user_id=user_id), (Comment.create_time, Comment.id))
 
     # 将评论转换为字典列表
     comments_list = [
@@ -157,7 +166,7 @@ def get_user_comments():
     ]
 
     # 返回成功响应
-    return jsonify({"state": 1, "message": "User comments", "comments": comments_list})
+    return jsonify({"state": 1, "message": "User comments", "comments": comments_list, "next_cursor": next_cursor})
 
 #用户获取自己所有被举报的评论
 
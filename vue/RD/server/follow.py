@@ -2,6 +2,9 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from __init__ import db
 from db import User, Follow, Article
+from sqlalchemy.orm import joinedload
+from pagination import keyset_paginate, list_response, request_cursor, page_limit
+from timeline import on_follow, on_unfollow, home_timeline, TIMELINE_ORDER
 
 follow_bp = Blueprint('follow_api', __name__)
 
@@ -27,6 +30,9 @@ def follow_user(user_id):
     # 创建关注关系
     new_follow = Follow(follower_id=current_user_id, followed_id=user_id)
     db.session.add(new_follow)
+    User.bump_counters(current_user_id, followings_count=1)
+    User.bump_counters(user_id, followers_count=1)
+    on_follow(current_user_id, user_id)  # 作者最近的文章补进时间线
     db.session.commit()
 
     return jsonify({"message": f"You are now following {followed_user.username}","cid":current_user_id,"uid":user_id}), 201
@@ -48,6 +54,9 @@ def unfollow_user(user_id):
 
     # 删除关注关系
     db.session.delete(follow)
+    User.bump_counters(current_user_id, followings_count=-1)
+    User.bump_counters(user_id, followers_count=-1)
+    on_unfollow(current_user_id, user_id)
     db.session.commit()
 
     return jsonify({"message": f"You have unfollowed {followed_user.username}"}), 200
@@ -57,11 +66,13 @@ def unfollow_user(user_id):
 @jwt_required()
 def get_following_users():
     current_user_id = get_jwt_identity()
-    following = Follow.query.filter_by(follower_id=current_user_id).all()
+    # 游标分页(最近关注的在前)，下一页游标在响应头 X-Next-Cursor 中
+    query = Follow.query.filter_by(follower_id=current_user_id).options(joinedload(Follow.followed))
+    following, next_cursor = keyset_paginate(query, (Follow.timestamp, Follow.id))
 
     following_users = []
     for follow in following:
-        user = User.query.get(follow.followed_id)
+        user = follow.followed
         following_users.append({
             'id': user.id,
             'username': user.username,
@@ -70,18 +81,20 @@ def get_following_users():
             'intro': user.intro
         })
 
-    return jsonify(following_users), 200
+    return list_response(following_users, next_cursor), 200
 
 # """获取当前用户的粉丝列表"""
 @follow_bp.route('/followers', methods=['GET'])
 @jwt_required()
 def get_followers():
     current_user_id = get_jwt_identity()
-    followers = Follow.query.filter_by(followed_id=current_user_id).all()
+    # 游标分页(最近关注的在前)，下一页游标在响应头 X-Next-Cursor 中
+    query = Follow.query.filter_by(followed_id=current_user_id).options(joinedload(Follow.follower))
+    followers, next_cursor = keyset_paginate(query, (Follow.timestamp, Follow.id))
 
     follower_users = []
     for follow in followers:
-        user = User.query.get(follow.follower_id)
+        user = follow.follower
         follower_users.append({
             'id': user.id,
             'username': user.username,
@@ -90,13 +103,14 @@ def get_followers():
             'intro': user.intro
         })
 
-    return jsonify(follower_users), 200
+    return list_response(follower_users, next_cursor), 200
 
 # """关注数 & 粉丝数统计"""
 @follow_bp.route('/follow-count/<int:user_id>', methods=['GET'])
 def get_follow_stats(user_id):
-    follow_count = Follow.query.filter_by(follower_id=user_id).count()
-    follower_count = Follow.query.filter_by(followed_id=user_id).count()
+    # 直接读取用户表上的冗余计数列
+    counts = db.session.query(User.followings_count, User.followers_count).filter(User.id == user_id).first()
+    follow_count, follower_count = counts if counts else (0, 0)
     return jsonify({ "following_count": follow_count, "follower_count": follower_count }), 200
 
 # """互相关注（好友）识别"""
@@ -248,23 +262,16 @@ def get_user_follow_status(user_id):
 @follow_bp.route('/following/articles', methods=['GET'])
 @jwt_required()
 def get_following_articles():
-    current_user_id = get_jwt_identity()  # 获取当前登录用户ID
-
-    # 查询当前用户关注的所有用户的ID
-    followed_users = Follow.query.filter_by(follower_id=current_user_id).all()
-    followed_user_ids = [follow.followed_id for follow in followed_users]
+    current_user_id = int(get_jwt_identity())  # 获取当前登录用户ID
 
-    # 查询这些用户发布的所有文章，并排除被屏蔽的文章（permission != 1）
-    articles = Article.query.filter(
-        Article.user_id.in_(followed_user_ids),
-        Article.permission != 1 , # 排除被屏蔽的文章
-        Article.status != 1  # 排除已删除的文章
-    ).order_by(Article.create_time.desc()).all()
+    # 从时间线表读取一页(关注作者发布时已写入)，合并大 V 的文章，排除被屏蔽、已删除的文章
+    articles, next_cursor = home_timeline(current_user_id, request_cursor(TIMELINE_ORDER), page_limit())
 
     # 构造返回结果
     articles_data = []
     for article in articles:
         articles_data.append(article.to_dict())  # 使用 Article 类的 to_dict 方法
 
-    return jsonify({"state": 1, "message": "Following articles", "articles": articles_data}), 200
+    return jsonify({"state": 1, "message": "Following articles", "articles": articles_data,
+                    "next_cursor": next_cursor}), 200
 
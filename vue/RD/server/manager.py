@@ -1,9 +1,20 @@
 from flask import Blueprint, request, jsonify
 from __init__ import db
-from db import User, Manager, Article,Follow, ArticleFavorite,Comment,Alike,UserBrowseRecord,CommentLike
+from db import User, Manager, Article,Follow, ArticleFavorite,Comment,Alike,UserBrowseRecord,UserBrowseLatest,CommentLike
 from datetime import datetime
-from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required
+from flask_jwt_extended import create_access_token
 from collections import OrderedDict
+from searchindex import search_index
+from textanalysis import text_analyzer
+from browselog import browse_log
+from hll import reader_sketches, SKETCH_AUTHOR
+from adminauth import admin_identities, admin_required, current_manager, MANAGER_AUTH_FAILED
+from batchload import loader
+from pagination import keyset_paginate
+
+def include_browse_records():
+    """用户信息是否内嵌浏览记录(?include=browse_records，默认不内嵌，分页获取见 /manager/user/<id>/browse-records)"""
+    return 'browse_records' in request.args.get('include', '').split(',')
 
 def truncate_filter(s, max_length=10, end='...'):
     if len(s) > max_length:
@@ -61,16 +72,12 @@ def manager_login():
 
 
 @manager_bp.route('/manager/add_mng', methods=['POST'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def add_manager():
     data = request.get_json()
 
-    # 获取当前登录的管理员id
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-
     # 检查当前管理员是否是第一个管理员（第一个管理员的 ID 为 1）：只有这个管理员有权限增加新的管理员
-    if current_manager.mng_id != 1:
+    if current_manager().mng_id != 1:
         return jsonify({"state": 0, "message": "Only the first manager can add new managers"}), 403
 
     # 获取新管理员的信息
@@ -115,16 +122,12 @@ def add_manager():
 
 
 @manager_bp.route('/manager/delete_mng', methods=['DELETE'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def delete_manager():
     data = request.get_json()
 
-    # 获取当前登录的管理员id
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-
     # 检查当前管理员是否是第一个管理员
-    if current_manager.mng_id != 1:
+    if current_manager().mng_id != 1:
         return jsonify({"state": 0, "message": "Only the first manager can delete other managers"}), 403
 
     # 获取要删除的管理员的标识符
@@ -151,8 +154,10 @@ def delete_manager():
         return jsonify({"state": 0, "message": "Cannot delete the first manager"}), 400
 
     # 删除管理员
+    deleted_mng_id = manager_to_delete.mng_id
     db.session.delete(manager_to_delete)
     db.session.commit()
+    admin_identities.invalidate(deleted_mng_id)  # 被删除的管理员的 Token 立即失效(本进程)
 
     return jsonify({"state": 1, "message": "Manager deleted successfully"})
 
@@ -160,14 +165,11 @@ def delete_manager():
 # 查看当前管理员列表接口
 # 注意：只有超级管理员（id=1)才能查看其他管理员
 @manager_bp.route('/manager/manager_list', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def list_managers():
-    # 获取当前登录的管理员id
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-
     # 检查当前管理员是否是第一个管理员
-    if current_manager.mng_id != 1:
+    me = current_manager()
+    if me.mng_id != 1:
         return jsonify({"state": 0, "message": "Only the first manager can view the list of managers"}), 403
 
     # 获取所有管理员信息
@@ -179,7 +181,7 @@ def list_managers():
             ("mng_gender", manager.mng_gender),
             ("mng_nickname", manager.mng_nickname),
             (
-            "mng_avatar", f"/static/{current_manager.mng_avatar}" if current_manager.mng_avatar else "/static/dog.jpg"),
+            "mng_avatar", f"/static/{me.mng_avatar}" if me.mng_avatar else "/static/dog.jpg"),
             ("mng_phone", manager.mng_phone),
             ("mng_email", manager.mng_email),
             ("mng_create_at", manager.mng_create_at.isoformat() if manager.mng_create_at else None)
@@ -192,23 +194,18 @@ def list_managers():
 
 # 管理员查看个人信息接口
 @manager_bp.route('/manager/profile', methods=['GET'])
-@jwt_required()
+@admin_required(status=404, body=MANAGER_AUTH_FAILED)
 def get_manager_profile():
-    # 验证当前登录的管理员id
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 404
-
+    me = current_manager()
     manager_info = OrderedDict([
-        ("mng_avatar", f"/static/{current_manager.mng_avatar}" if current_manager.mng_avatar else "/static/my.jpg"),
-        ("mng_id", current_manager.mng_id),
-        ("mng_name", current_manager.mng_name),
-        ("mng_gender", current_manager.mng_gender),
-        ("mng_nickname", current_manager.mng_nickname),
-        ("mng_phone", current_manager.mng_phone),
-        ("mng_email", current_manager.mng_email),
-        ("mng_create_at", current_manager.mng_create_at.isoformat() if current_manager.mng_create_at else None)
+        ("mng_avatar", f"/static/{me.mng_avatar}" if me.mng_avatar else "/static/my.jpg"),
+        ("mng_id", me.mng_id),
+        ("mng_name", me.mng_name),
+        ("mng_gender", me.mng_gender),
+        ("mng_nickname", me.mng_nickname),
+        ("mng_phone", me.mng_phone),
+        ("mng_email", me.mng_email),
+        ("mng_create_at", me.mng_create_at.isoformat() if me.mng_create_at else None)
     ])
 
     return jsonify({"state": 1, "message": "Manager profile", "profile": manager_info})
@@ -216,49 +213,47 @@ def get_manager_profile():
 
 # 管理员修改个人信息接口
 @manager_bp.route('/manager/update_profile', methods=['PUT'])
-@jwt_required()
+@admin_required(status=404, body=MANAGER_AUTH_FAILED)
 def update_manager_profile():
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 404
+    me = Manager.query.get(current_manager().mng_id)  # 需要修改，直接读取数据库对象
+    if not me:  # 身份缓存可能晚于其他进程的删除
+        return jsonify(MANAGER_AUTH_FAILED), 404
 
     data = request.get_json()
 
     # 更新管理员信息
     if 'm_name' in data:
         # 检查用户名是否已存在
-        if data['m_name'] != current_manager.mng_name:
+        if data['m_name'] != me.mng_name:
             existing_manager = Manager.query.filter_by(mng_name=data['m_name']).first()
             if existing_manager:
                 return jsonify({"state": 0, "message": "用户名已存在"}), 400
-            current_manager.mng_name = data['m_name']
+            me.mng_name = data['m_name']
 
     if 'm_nickname' in data:
-        current_manager.mng_nickname = data['m_nickname']
+        me.mng_nickname = data['m_nickname']
 
     if 'm_gender' in data:
-        current_manager.mng_gender = data['m_gender']
+        me.mng_gender = data['m_gender']
 
     if 'm_avatar' in data:
-        current_manager.mng_avatar = data['m_avatar']
+        me.mng_avatar = data['m_avatar']
 
     if 'm_email' in data:
         # 只有当邮箱被修改时才进行唯一性检查
-        if data['m_email'] != current_manager.mng_email:
+        if data['m_email'] != me.mng_email:
             existing_manager = Manager.query.filter_by(mng_email=data['m_email']).first()
             if existing_manager:
                 return jsonify({"state": 0, "message": "邮箱已存在"}), 400
-            current_manager.mng_email = data['m_email']
+            me.mng_email = data['m_email']
 
     if 'm_phone' in data:
         # 只有当手机号被修改时才进行唯一性检查
-        if data['m_phone'] != current_manager.mng_phone:
+        if data['m_phone'] != me.mng_phone:
             existing_manager = Manager.query.filter_by(mng_phone=data['m_phone']).first()
             if existing_manager:
                 return jsonify({"state": 0, "message": "手机号已存在"}), 400
-            current_manager.mng_phone = data['m_phone']
+            me.mng_phone = data['m_phone']
 
     if 'm_password' in data and 'current_password' in data:
         # 确保原始密码和新密码都不为空
@@ -266,37 +261,32 @@ def update_manager_profile():
             return jsonify({"state": 0, "message": "原始密码和新密码都不能为空"}), 400
 
         # 验证原始密码
-        if not current_manager.check_password(data['current_password']):
+        if not me.check_password(data['current_password']):
             return jsonify({"state": 0, "message": "原始密码不正确"}), 400
 
         # 确保新密码与原始密码不同
         if data['current_password'] == data['m_password']:
             return jsonify({"state": 0, "message": "新密码不能与原始密码相同"}), 400
 
-        current_manager.set_password(data['m_password'])
+        me.set_password(data['m_password'])
 
     db.session.commit()
+    admin_identities.invalidate(me.mng_id)
 
     return jsonify({"state": 1, "message": "个人信息更新成功"})
 
 
 # 管理员查看用户列表接口
 @manager_bp.route('/manager/user_list', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def list_users():
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
-    # 查询所有用户
-    users = User.query.all()
+    # 查询用户(游标分页，最新注册的在前)
+    users, next_cursor = keyset_paginate(User.query, (User.create_at, User.id))
 
-    # 将用户对象转换为字典列表，调用模型中的 to_dict() 方法
-    users_list = [user.to_dict() for user in users]
+    # 将用户对象转换为字典列表，各项计数用一条聚合查询批量取回
+    users_list = User.to_dict_list(users, include_browse_records())
 
-    return jsonify({"state": 1, "message": "List of users", "users": users_list})
+    return jsonify({"state": 1, "message": "List of users", "users": users_list, "next_cursor": next_cursor})
 
 
 # 管理员修改用户状态接口
@@ -309,14 +299,8 @@ def list_users():
 
 
 @manager_bp.route('/manager/update_user_status', methods=['POST'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def update_user_status():
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     data = request.get_json()
 
     # 参数校验
@@ -377,14 +361,8 @@ def update_user_status():
 
 """
 @manager_bp.route('/manager/update_user_permission', methods=['POST'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def update_user_permission():
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     data = request.get_json()
 
     # 参数校验：必须有 u_account，其他权限字段为可选
@@ -439,14 +417,8 @@ def update_user_permission():
 
 # 管理员获取指定用户的名字
 @manager_bp.route('/manager/user/<int:user_id>', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_user_detail(user_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标用户是否存在
     target_user = User.query.get(user_id)
     if not target_user:
@@ -456,19 +428,14 @@ def get_user_detail(user_id):
     return jsonify({
         "state": 1,
         "message": "用户信息获取成功",
-        "user": target_user.username
+        "user": target_user.username,
+        "unique_readers": reader_sketches.unique_readers_of(SKETCH_AUTHOR, user_id)  # 该用户文章的独立读者数(近似值)
     }), 200
     
 # 管理员查看特定用户发布过的文章列表
 @manager_bp.route('/manager/user/<int:user_id>/published-articles', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_user_published_articles(user_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标用户是否存在
     target_user = User.query.get(user_id)
     if not target_user:
@@ -480,8 +447,9 @@ def get_user_published_articles(user_id):
     # 按创建时间排序（从新到旧）
     user_articles.sort(key=lambda x: x.create_time, reverse=True)
 
-    # 转换文章对象为字典格式
-    articles = [article.mng_to_dict() for article in user_articles]
+    # 转换文章对象为字典格式(评论/点赞/收藏数一次查询)
+    counts = Article.count_aggregates(article.id for article in user_articles)
+    articles = [article.mng_to_dict(counts.get(article.id)) for article in user_articles]
 
     return jsonify({
         "state": 1,
@@ -492,14 +460,8 @@ def get_user_published_articles(user_id):
 
 # 管理员查看特定用户的评论记录
 @manager_bp.route('/manager/user/<int:user_id>/comments', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_user_comments(user_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标用户是否存在
     target_user = User.query.get(user_id)
     if not target_user:
@@ -510,8 +472,9 @@ def get_user_comments(user_id):
 
     # 获取评论的详细信息，包括文章标题
     user_comments_list = []
-    for comment in user_comments:
-        article = Article.query.get(comment.article_id)
+    user_info = target_user.to_dict()
+    articles = loader(Article).load_many(comment.article_id for comment in user_comments)
+    for comment, article in zip(user_comments, articles):
         if article:
             user_comments_list.append({
                 "comment_id": comment.id,
@@ -525,7 +488,7 @@ def get_user_comments(user_id):
                 "comment_reply_count": comment.reply_count,
                 "comment_is_approved": comment.is_approved,
                 'depth': comment.depth,
-                "user_info": target_user.to_dict()
+                "user_info": user_info
             })
 
     # 按评论时间排序（从新到旧）
@@ -541,14 +504,8 @@ def get_user_comments(user_id):
 
 # 管理员查看特定用户的点赞文章列表
 @manager_bp.route('/manager/user/<int:user_id>/liked-articles', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_user_liked_articles(user_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标用户是否存在
     target_user = User.query.get(user_id)
     if not target_user:
@@ -559,8 +516,8 @@ def get_user_liked_articles(user_id):
 
     # 获取点赞文章的详细信息
     liked_articles = []
-    for like in user_likes:
-        article = Article.query.get(like.article_id)
+    articles = loader(Article).load_many(like.article_id for like in user_likes)
+    for like, article in zip(user_likes, articles):
         if article:
             liked_articles.append({
                 "article_info": article.to_dict(),
@@ -578,16 +535,50 @@ def get_user_liked_articles(user_id):
         "liked_articles": liked_articles
     }), 200
     
+# 管理员分页查看指定用户的浏览记录(最新优先)
+@manager_bp.route('/manager/user/<int:user_id>/browse-records', methods=['GET'])
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
+def get_user_browse_records(user_id):
+    # 检查目标用户是否存在
+    target_user = User.query.get(user_id)
+    if not target_user:
+        return jsonify({"state": 0, "message": "目标用户不存在"}), 404
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)  # 每页20条，最多100条
+
+    # 原始浏览记录(保留期内)，与文章表连接取标题，使用 (user_id, browse_time) 索引分页
+    pagination = (db.session.query(UserBrowseRecord.id, UserBrowseRecord.article_id, Article.title,
+                                   UserBrowseRecord.browse_time)
+                  .join(Article, Article.id == UserBrowseRecord.article_id)
+                  .filter(UserBrowseRecord.user_id == user_id)
+                  .order_by(UserBrowseRecord.browse_time.desc(), UserBrowseRecord.id.desc())
+                  .paginate(page=page, per_page=per_page, error_out=False))
+
+    browse_records = [
+        {
+            "record_id": record_id,
+            "article_id": article_id,
+            "article_title": title,
+            "browse_time": browse_time.isoformat()
+        }
+        for record_id, article_id, title, browse_time in pagination.items
+    ]
+
+    return jsonify({
+        "state": 1,
+        "message": f"用户 {user_id} 的浏览记录",
+        "browse_records": browse_records,
+        "total_pages": pagination.pages,
+        "total_items": pagination.total,
+        "current_page": page,
+        "per_page": per_page
+    }), 200
+
 # 管理员获取指定用户的粉丝列表，返回完整用户信息。
 @manager_bp.route('/manager/followers/<int:user_id>', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_user_followers(user_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标用户是否存在
     target_user = User.query.get(user_id)
     if not target_user:
@@ -596,12 +587,9 @@ def get_user_followers(user_id):
     # 查找所有关注该用户的记录（即粉丝）
     follower_relationships = Follow.query.filter_by(followed_id=user_id).all()
 
-    # 构造粉丝用户列表，调用每个用户的 to_dict()
-    followers_list = []
-    for rel in follower_relationships:
-        follower_user = User.query.get(rel.follower_id)
-        if follower_user:
-            followers_list.append(follower_user.to_dict())
+    # 构造粉丝用户列表(批量序列化)
+    followers = loader(User).load_many(rel.follower_id for rel in follower_relationships)
+    followers_list = User.to_dict_list((user for user in followers if user), include_browse_records())
 
     return jsonify({
         "state": 1,
@@ -611,15 +599,9 @@ def get_user_followers(user_id):
 
 # 管理员获取指定用户的关注列表，返回完整用户信息。
 @manager_bp.route('/manager/following/<int:user_id>', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_user_following(user_id):
 
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标用户是否存在
     target_user = User.query.get(user_id)
     if not target_user:
@@ -628,11 +610,8 @@ def get_user_following(user_id):
     # 查找该用户关注的所有人（即关注列表）
     following_relationships = Follow.query.filter_by(follower_id=user_id).all()
 
-    following_users_list = []
-    for rel in following_relationships:
-        followed_user = User.query.get(rel.followed_id)
-        if followed_user:
-            following_users_list.append(followed_user.to_dict())
+    following_users = loader(User).load_many(rel.followed_id for rel in following_relationships)
+    following_users_list = User.to_dict_list((user for user in following_users if user), include_browse_records())
 
     return jsonify({
         "state": 1,
@@ -642,14 +621,8 @@ def get_user_following(user_id):
 
 # 管理员获取指定文章的收藏列表，返回收藏该文章的用户信息。
 @manager_bp.route('/manager/favorites/<int:article_id>', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_article_favorites(article_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标文章是否存在
     target_article = Article.query.get(article_id)
     if not target_article:
@@ -659,11 +632,8 @@ def get_article_favorites(article_id):
     favorite_relationships = ArticleFavorite.query.filter_by(article_id=article_id).all()
 
     # 获取收藏该文章的用户信息
-    favorite_users_list = []
-    for favorite in favorite_relationships:
-        user = User.query.get(favorite.user_id)
-        if user:
-            favorite_users_list.append(user.to_dict())
+    favorite_users = loader(User).load_many(favorite.user_id for favorite in favorite_relationships)
+    favorite_users_list = User.to_dict_list((user for user in favorite_users if user), include_browse_records())
 
     # 按收藏时间排序（可选）
     favorite_users_list.sort(key=lambda x: x['create_at'], reverse=True)
@@ -677,14 +647,8 @@ def get_article_favorites(article_id):
 
 # 管理员查看特定文章的评论用户列表
 @manager_bp.route('/manager/article/<int:article_id>/comment-users', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_article_comment_users(article_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标文章是否存在
     target_article = Article.query.get(article_id)
     if not target_article:
@@ -695,11 +659,12 @@ def get_article_comment_users(article_id):
 
     # 获取评论用户的详细信息
     comment_users = []
-    for comment in comments:
-        user = User.query.get(comment.user_id)
+    users = loader(User).load_many(comment.user_id for comment in comments)
+    counts = User.count_aggregates(user.id for user in users if user)
+    for comment, user in zip(comments, users):
         if user:
             comment_users.append({
-                "user_info": user.to_dict(),
+                "user_info": user.to_dict(counts.get(user.id)),
                 "comment_content": truncate_filter(comment.content, max_length=10, end='...'),
                 "comment_create_time": comment.create_time.isoformat(),
                 "comment_update_time": comment.update_time.isoformat() if comment.update_time else None,
@@ -720,14 +685,8 @@ def get_article_comment_users(article_id):
 
 # 管理员查看特定文章的点赞用户列表
 @manager_bp.route('/manager/article/<int:article_id>/like-users', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_article_like_users(article_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标文章是否存在
     target_article = Article.query.get(article_id)
     if not target_article:
@@ -738,11 +697,12 @@ def get_article_like_users(article_id):
 
     # 获取点赞用户的详细信息
     like_users = []
-    for like in likes:
-        user = User.query.get(like.user_id)
+    users = loader(User).load_many(like.user_id for like in likes)
+    counts = User.count_aggregates(user.id for user in users if user)
+    for like, user in zip(likes, users):
         if user:
             like_users.append({
-                "user_info": user.to_dict(),
+                "user_info": user.to_dict(counts.get(user.id)),
                 "like_create_time": like.create_time.isoformat()
             })
 
@@ -759,29 +719,24 @@ def get_article_like_users(article_id):
 
 # 管理员查看特定文章的浏览者列表
 @manager_bp.route('/manager/article/<int:article_id>/browsers', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_article_browsers(article_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标文章是否存在
     target_article = Article.query.get(article_id)
     if not target_article:
         return jsonify({"state": 0, "message": "目标文章不存在"}), 404
 
-    # 查找该文章的所有浏览记录
-    browsers = UserBrowseRecord.query.filter_by(article_id=article_id).all()
+    # 查找该文章的浏览者(每个用户一行最新浏览记录)
+    browsers = UserBrowseLatest.query.filter_by(article_id=article_id).all()
 
     # 获取浏览者的详细信息
     browser_users = []
-    for record in browsers:
-        user = User.query.get(record.user_id)
+    users = loader(User).load_many(record.user_id for record in browsers)
+    counts = User.count_aggregates(user.id for user in users if user)
+    for record, user in zip(browsers, users):
         if user:
             browser_users.append({
-                "user_info": user.to_dict(),
+                "user_info": user.to_dict(counts.get(user.id)),
                 "browse_time": record.browse_time.isoformat()
             })
 
@@ -798,14 +753,8 @@ def get_article_browsers(article_id):
 
 # 管理员根据用户 ID 或用户名查看用户信息
 @manager_bp.route('/manager/user/search', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def search_user():
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 获取查询参数
     user_id = request.args.get('user_id', type=int)
     username = request.args.get('username', type=str)
@@ -825,31 +774,28 @@ def search_user():
     return jsonify({
         "state": 1,
         "message": "用户信息获取成功",
-        "user": user.to_dict()
+        "user": user.to_dict(browse_records=User.browse_records_of([user.id])[user.id] if include_browse_records() else None)
     }), 200
 
 # 获取所有评论列表（管理员专用）
 @manager_bp.route('/manager/comment_list', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_all_comments():
-    comments = Comment.query.all()
+    # 游标分页，最新优先；评论者随评论一起取回(to_dict 中用到)
+    comments, next_cursor = keyset_paginate(Comment.query.options(db.joinedload(Comment.user)),
+                                            (Comment.create_time, Comment.id))
     comments_list = [comment.to_dict() for comment in comments]
     return jsonify({
         "state": 1,
         "message": "List of comments",
-        "comments_list": comments_list
+        "comments_list": comments_list,
+        "next_cursor": next_cursor
     })
 
 # 管理员获取评论内容
 @manager_bp.route('/manager/comment/<int:comment_id>/content', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_comment_content(comment_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 查询评论
     comment = Comment.query.get(comment_id)
     if not comment:
@@ -867,14 +813,8 @@ def get_comment_content(comment_id):
 
 # 管理员修改评论状态（屏蔽/恢复评论）
 @manager_bp.route('/manager/comment/<int:comment_id>/status', methods=['POST'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def update_comment_status(comment_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标评论是否存在
     target_comment = Comment.query.get(comment_id)
     if not target_comment:
@@ -910,14 +850,8 @@ def update_comment_status(comment_id):
 
 # 管理员删除评论
 @manager_bp.route('/manager/comment/<int:comment_id>/delete', methods=['POST'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def delete_comment(comment_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标评论是否存在
     target_comment = Comment.query.get(comment_id)
     if not target_comment:
@@ -936,14 +870,8 @@ def delete_comment(comment_id):
 
 # 管理员查看特定评论的回复列表
 @manager_bp.route('/manager/comment/<int:comment_id>/replies', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_comment_replies(comment_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标评论是否存在
     target_comment = Comment.query.get(comment_id)
     if not target_comment:
@@ -986,14 +914,8 @@ def get_comment_replies(comment_id):
 
 # 管理员查看特定评论
 @manager_bp.route('/manager/comment/<int:comment_id>', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_commen(comment_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标评论是否存在
     target_comment = Comment.query.get(comment_id)
     if not target_comment:
@@ -1008,14 +930,8 @@ def get_commen(comment_id):
 
 # 管理员查看特定评论的点赞用户列表
 @manager_bp.route('/manager/comment/<int:comment_id>/likes', methods=['GET'])
-@jwt_required()
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
 def get_comment_likes(comment_id):
-    # 验证管理员身份
-    current_mng_id = get_jwt_identity()
-    current_manager = Manager.query.get(current_mng_id)
-    if not current_manager:
-        return jsonify({"state": 0, "message": "管理员身份验证失败"}), 401
-
     # 检查目标评论是否存在
     target_comment = Comment.query.get(comment_id)
     if not target_comment:
@@ -1026,8 +942,8 @@ def get_comment_likes(comment_id):
 
     # 获取点赞用户的指定信息
     like_users = []
-    for like in like_records:
-        user = User.query.get(like.user_id)
+    users = loader(User).load_many(like.user_id for like in like_records)
+    for like, user in zip(like_records, users):
         if user:
             like_users.append({
                 "user_id": user.id,
@@ -1048,3 +964,26 @@ def get_comment_likes(comment_id):
         "like_users": like_users
     }), 200
 
+
+
+# 管理员查看运行指标接口(缓存命中率等，用于调整缓存容量)
+@manager_bp.route('/manager/metrics', methods=['GET'])
+@admin_required(status=401, body=MANAGER_AUTH_FAILED)
+def get_metrics():
+    analysis_lookups = text_analyzer.hits + text_analyzer.misses
+    return jsonify({
+        "state": 1,
+        "message": "运行指标",
+        "metrics": {
+            "search_cache": search_index.cache.stats(),
+            "text_analysis_cache": {
+                "size": len(text_analyzer.cache),
+                "capacity": text_analyzer.cache_size,
+                "hits": text_analyzer.hits,
+                "misses": text_analyzer.misses,
+                "hit_rate": round(text_analyzer.hits / analysis_lookups, 4) if analysis_lookups else 0.0,
+            },
+            "browse_log": browse_log.stats(),
+            "admin_identity_cache": admin_identities.stats(),
+        }
+    }), 200
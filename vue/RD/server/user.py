@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from __init__ import db
 from db import User, Alike, ArticleFavorite
-from tokenblock import TokenBlocklist
+from tokenblock import TokenBlocklist, blocklist_cache
 from werkzeug.security import generate_password_hash
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from datetime import datetime
@@ -362,7 +362,9 @@ def update_user_profile():
 def logout_user():
 
     identity = get_jwt_identity()
-    jti = get_jwt()["jti"]         # 获取当前 Token 的唯一标识
+    jwt_payload = get_jwt()
+    jti = jwt_payload["jti"]         # 获取当前 Token 的唯一标识
+    expires_at = datetime.utcfromtimestamp(jwt_payload["exp"])  # Token 过期后注销记录即可清理
 
     user = User.query.filter_by(id=identity).first()
     if not user:
@@ -373,8 +375,9 @@ def logout_user():
     db.session.commit()
 
     # 拉黑 Token
-    db.session.add(TokenBlocklist(jti=jti, created_at=datetime.utcnow()))
+    db.session.add(TokenBlocklist(jti=jti, created_at=datetime.utcnow(), expires_at=expires_at))
     db.session.commit()
+    blocklist_cache.add(jti)
 
     return jsonify({"state": 1, "message": "Logout successful"}), 200
 
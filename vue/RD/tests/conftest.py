@@ -0,0 +1,28 @@
+import os
+import sys
+import tempfile
+import pytest
+
+RD_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 配置在导入时读取环境变量(收集测试时 pytest 可能已导入 config)，所以在这里设置：临时 SQLite 数据库，不启动后台任务
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ['BACKGROUND_JOBS'] = '0'
+sys.path.insert(0, RD_DIR)
+
+
+@pytest.fixture(scope='session')
+def app():
+    import run
+    return run.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def manager_headers(client):
+    token = client.post('/manager/login', json={'m_account': 'aa', 'm_password': '1234'}).json['token']
+    return {'Authorization': 'Bearer ' + token}
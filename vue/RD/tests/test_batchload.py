@@ -0,0 +1,126 @@
+import pytest
+from sqlalchemy import event
+
+
+def make_users(db, User, prefix, n):
+    users = [User(username=f'{prefix}{i}', password_hash='x', gender='男', nickname=f'{prefix}{i}',
+                  email=f'{prefix}{i}@example.com') for i in range(n)]
+    db.session.add_all(users)
+    db.session.flush()
+    return users
+
+
+@pytest.fixture(scope='module')
+def fans(app):
+    """
+    两个作者，分别有 1 个和 50 个粉丝；每个粉丝都点赞、收藏、评论、浏览了作者的文章，并点赞了作者在另一篇文章下的评论
+    返回 {N: {'author': 作者 id, 'article': 文章 id, 'comment': 作者评论 id}}
+    """
+    from datetime import datetime
+    from __init__ import db
+    from db import User, Article, Follow, Alike, ArticleFavorite, Comment, CommentLike, UserBrowseLatest
+    result = {}
+    with app.app_context():
+        for n in (1, 50):
+            author = make_users(db, User, f'author{n}_', 1)[0]
+            article = Article(title=f'文章 {n}', content='内容', user_id=author.id)
+            pinned = Article(title=f'置顶 {n}', content='内容', user_id=author.id)  # 作者评论所在的文章
+            db.session.add_all([article, pinned])
+            db.session.flush()
+            comment = Comment(content='作者评论', user_id=author.id, article_id=pinned.id)
+            db.session.add(comment)
+            db.session.flush()
+            for fan in make_users(db, User, f'fan{n}_', n):
+                db.session.add(Follow(follower_id=fan.id, followed_id=author.id))
+                db.session.add(Alike(user_id=fan.id, article_id=article.id))
+                db.session.add(ArticleFavorite(user_id=fan.id, article_id=article.id))
+                db.session.add(Comment(content='评论', user_id=fan.id, article_id=article.id))
+                db.session.add(CommentLike(user_id=fan.id, comment_id=comment.id))
+                db.session.add(UserBrowseLatest(user_id=fan.id, article_id=article.id, browse_time=datetime.utcnow()))
+            result[n] = {'author': author.id, 'article': article.id, 'comment': comment.id}
+        db.session.commit()
+    return result
+
+
+@pytest.fixture(scope='module')
+def activity(app):
+    """
+    按 N=1/50 各准备一组数据：带标签 qcN 的 N 篇文章(各有来自不同用户的评论、点赞、收藏)，
+    以及一个在这些文章下各评论、点赞一次并关注了这 N 个评论者的用户
+    返回 {N: {'tag': 标签, 'writer': 作者 id, 'commenter': 该用户 id}}
+    """
+    from __init__ import db
+    from db import User, Article, Comment, Alike, ArticleFavorite, Follow
+    result = {}
+    with app.app_context():
+        for n in (1, 50):
+            author = make_users(db, User, f'writer{n}_', 1)[0]
+            commenter = make_users(db, User, f'commenter{n}_', 1)[0]
+            readers = make_users(db, User, f'reader{n}_', n)
+            articles = [Article(title=f'文章 {n}-{i}', content='内容', tag=f'qc{n}', user_id=author.id)
+                        for i in range(n)]
+            db.session.add_all(articles)
+            db.session.flush()
+            for article, reader in zip(articles, readers):
+                db.session.add(Comment(content='评论', user_id=reader.id, article_id=article.id))
+                db.session.add(Comment(content='评论', user_id=commenter.id, article_id=article.id))
+                db.session.add(Alike(user_id=reader.id, article_id=article.id))
+                db.session.add(ArticleFavorite(user_id=reader.id, article_id=article.id))
+                db.session.add(Alike(user_id=commenter.id, article_id=article.id))
+                db.session.add(Follow(follower_id=commenter.id, followed_id=reader.id))
+            result[n] = {'tag': f'qc{n}', 'writer': author.id, 'commenter': commenter.id}
+        db.session.commit()
+    return result
+
+
+def count_queries(app, client, url, headers):
+    """请求 url 执行的 SQL 语句数(先请求一次，排除管理员身份缓存等首次加载)"""
+    from __init__ import db
+    assert client.get(url, headers=headers).status_code == 200
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200
+    return len(statements), response.json
+
+
+@pytest.mark.parametrize('url, key', [
+    ('/manager/followers/{author}', 'followers'),
+    ('/manager/article/{article}/like-users', 'like_users'),
+    ('/manager/favorites/{article}', 'favorites'),
+    ('/manager/article/{article}/comment-users', 'comment_users'),
+    ('/manager/article/{article}/browsers', 'browser_users'),
+    ('/manager/comment/{comment}/likes', 'like_users'),
+])
+def test_query_count_does_not_grow_with_list_size(app, client, manager_headers, fans, url, key):
+    counts = {}
+    for n, params in fans.items():
+        counts[n], body = count_queries(app, client, url.format(**params), manager_headers)
+        assert len(body[key]) == n
+    assert counts[1] == counts[50]
+
+
+@pytest.mark.parametrize('url, key', [
+    ('/manager/user_list?limit={n}', 'users'),
+    ('/manager/article_list?tag={tag}', 'articles'),
+    ('/manager/comment_list?limit={n}', 'comments_list'),
+    ('/manager/user/{commenter}/comments', 'comments'),
+    ('/manager/user/{commenter}/liked-articles', 'liked_articles'),
+    ('/manager/following/{commenter}', 'following'),
+    ('/manager/user/{writer}/published-articles', 'articles'),
+])
+def test_admin_list_query_count_does_not_grow_with_page_size(app, client, manager_headers, activity, url, key):
+    counts = {}
+    for n, params in activity.items():
+        counts[n], body = count_queries(app, client, url.format(n=n, **params), manager_headers)
+        assert len(body[key]) == n
+    assert counts[1] == counts[50]
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from recommender import top_k_rows
+
+
+def naive_top_k(scores, eligible, k):
+    """对照实现：全部行按分数降序排序后依次筛选"""
+    return [i for i in sorted(range(len(scores)), key=lambda i: -scores[i]) if eligible[i]][:k]
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('k', [1, 5, 10, 200])
+def test_top_k_rows_matches_naive_sort(seed, k):
+    rng = np.random.default_rng(seed)
+    scores = rng.random(100) - 0.2
+    eligible = (scores > 0) & (rng.random(100) > 0.3)
+    assert top_k_rows(scores, eligible, k).tolist() == naive_top_k(scores, eligible, k)
+
+
+def test_top_k_rows_with_ties_keeps_best_scores():
+    # 分数相同的行可以任选，只比较选出的分数序列
+    scores = np.array([3, 1, 3, 2, 2, 2, 0, 3], dtype=float)
+    eligible = np.array([True, True, False, True, True, True, True, True])
+    rows = top_k_rows(scores, eligible, 4)
+    assert all(eligible[rows])
+    assert scores[rows].tolist() == [3, 3, 2, 2]
+
+
+def test_top_k_rows_without_eligible_rows():
+    assert top_k_rows(np.arange(5, dtype=float), np.zeros(5, dtype=bool), 3).tolist() == []
@@ -0,0 +1,119 @@
+import re
+import html
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+try:
+    import jieba  # 可选依赖：安装后可使用词典分词
+except ImportError:
+    jieba = None
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_TOKEN_RE = re.compile(r'[\u4e00-\u9fff]+|[a-z0-9]+(?:[._+#-][a-z0-9]+)*[+#]*')
+_CJK_RE = re.compile(r'[\u4e00-\u9fff]+')
+
+# 中文停用字：连续汉字在这些字处断开，不参与组成二元词
+CJK_STOP_CHARS = set('的了和是在就都而及与着或也把被让吗呢吧啊')
+_CJK_STOP_RE = re.compile('[' + ''.join(sorted(CJK_STOP_CHARS)) + ']')
+STOPWORDS = {
+    # 中文
+    '我们', '你们', '他们', '她们', '它们', '这个', '那个', '这些', '那些', '一个', '没有', '什么', '怎么',
+    '可以', '因为', '所以', '但是', '如果', '就是', '还是', '已经', '自己', '这样', '那么', '以及', '进行',
+    # 英文
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'has', 'have', 'if', 'in', 'into',
+    'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'their', 'this', 'to', 'was', 'were', 'will', 'with',
+    # WangEditor 内容中常见的 HTML 实体/属性残留
+    'nbsp', 'amp', 'quot', 'lt', 'gt',
+}
+
+
+def strip_html(text):
+    """去掉 WangEditor 富文本中的 HTML 标签并还原实体"""
+    return html.unescape(_TAG_RE.sub(' ', text or ''))
+
+
+def _cjk_bigrams(run):
+    """连续汉字切成重叠二元词(单字保留为一元词)，在停用字处断开"""
+    tokens = []
+    for part in _CJK_STOP_RE.split(run):
+        if len(part) == 1:
+            tokens.append(part)
+        else:
+            tokens.extend(part[i:i + 2] for i in range(len(part) - 1))
+    return tokens
+
+
+def _cjk_jieba(run):
+    return [w for w in jieba.cut_for_search(run) if w.strip() and w not in CJK_STOP_CHARS]
+
+
+class TextAnalyzer:
+    """
+    推荐和搜索共用的文本分析流水线：去 HTML -> 小写 -> 中文分词(二元词/词典) + 英文数字词 -> 去停用词
+    结果按内容哈希缓存(LRU)，同一篇文章的内容只分析一次
+    """
+
+    SEGMENTERS = {'bigram': _cjk_bigrams, 'jieba': _cjk_jieba}
+
+    def __init__(self, segmenter='bigram', cache_size=20000):
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.configure(segmenter, cache_size)
+
+    def init_app(self, app):
+        self.configure(app.config['TEXT_ANALYZER'], app.config['TEXT_ANALYSIS_CACHE_SIZE'])
+
+    def configure(self, segmenter, cache_size):
+        if segmenter == 'jieba' and jieba is None:
+            logging.warning("未安装 jieba，中文分词退回二元词(bigram)模式")
+            segmenter = 'bigram'
+        if segmenter not in self.SEGMENTERS:
+            raise ValueError(f"未知的分词方式: {segmenter}")
+        with self.lock:
+            self.segmenter = segmenter
+            self.cache_size = cache_size
+            self.cache.clear()
+
+    @property
+    def signature(self):
+        """分析规则的标识，分析规则变化时持久化的索引需要重建"""
+        return f'{self.segmenter}-v1'
+
+    def analyze(self, text, html_content=True):
+        """返回词项列表(保留重复，供 TF 统计)"""
+        key = hashlib.md5((text or '').encode('utf-8')).digest() + (b'h' if html_content else b't')
+        with self.lock:
+            tokens = self.cache.get(key)
+            if tokens is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return tokens
+            self.misses += 1
+
+        tokens = self._analyze(strip_html(text) if html_content else (text or ''))
+        with self.lock:
+            self.cache[key] = tokens
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return tokens
+
+    def _analyze(self, text):
+        segment = self.SEGMENTERS[self.segmenter]
+        tokens = []
+        for token in _TOKEN_RE.findall(text.lower()):
+            if _CJK_RE.fullmatch(token):
+                tokens.extend(t for t in segment(token) if t not in STOPWORDS)
+            elif len(token) > 1 and token not in STOPWORDS:
+                tokens.append(token)
+        return tuple(tokens)
+
+
+text_analyzer = TextAnalyzer()
+
+
+def analyze(text, html_content=True):
+    return text_analyzer.analyze(text, html_content)
@@ -0,0 +1,128 @@
+import logging
+from flask import current_app
+from sqlalchemy import select, literal, exists
+from sqlalchemy.orm import joinedload
+from __init__ import db
+from db import Article, Follow, TimelineEntry, User, DataMigration
+from pagination import keyset_query, encode_cursor
+
+TIMELINES_BACKFILL = 'timelines_backfill'  # 迁移标记：关注动态时间线已构建
+TIMELINE_COLUMNS = ['user_id', 'article_id', 'author_id', 'create_time']
+TIMELINE_ORDER = (TimelineEntry.create_time, TimelineEntry.article_id)  # 排序键(最新优先)，游标按这两列解码
+
+
+def is_popular(followers_count):
+    """粉丝数超过 TIMELINE_FANOUT_MAX_FOLLOWERS 的作者不写扩散，读取时合并"""
+    return (followers_count or 0) > current_app.config['TIMELINE_FANOUT_MAX_FOLLOWERS']
+
+
+def _followers_count(author_id):
+    return db.session.query(User.followers_count).filter(User.id == author_id).scalar()
+
+
+def _visible(query):
+    return query.filter(Article.permission != 1, Article.status != 1)  # 排除被屏蔽、已删除的文章
+
+
+def fanout_article(article):
+    """
+    作者发布文章后写入所有粉丝的时间线(一条 INSERT ... SELECT)，返回是否写入
+    可见性(屏蔽、删除)在读取时过滤，之后状态变化不需要改时间线
+    """
+    if is_popular(_followers_count(article.user_id)):
+        return False
+    rows = select(Follow.follower_id, literal(article.id, db.Integer), literal(article.user_id, db.Integer),
+                  literal(article.create_time, db.DateTime)).where(Follow.followed_id == article.user_id)
+    db.session.execute(TimelineEntry.__table__.insert().from_select(TIMELINE_COLUMNS, rows))
+    db.session.commit()
+    return True
+
+
+def on_follow(follower_id, author_id):
+    """关注时把作者最近的 TIMELINE_BACKFILL 篇文章补进粉丝的时间线(随调用方的 commit 提交)"""
+    if is_popular(_followers_count(author_id)):
+        return
+    recent = (db.session.query(Article.id, Article.create_time).filter(Article.user_id == author_id)
+              .order_by(Article.create_time.desc(), Article.id.desc())
+              .limit(current_app.config['TIMELINE_BACKFILL']).all())
+    db.session.bulk_insert_mappings(TimelineEntry, [
+        {'user_id': follower_id, 'article_id': article_id, 'author_id': author_id, 'create_time': create_time}
+        for article_id, create_time in recent])
+
+
+def _fanout_recent(author_id):
+    """把作者最近的 TIMELINE_BACKFILL 篇文章写入所有粉丝的时间线(一条 INSERT ... SELECT，已有的跳过)"""
+    recent = [article_id for article_id, in db.session.query(Article.id).filter(Article.user_id == author_id)
+              .order_by(Article.create_time.desc(), Article.id.desc())
+              .limit(current_app.config['TIMELINE_BACKFILL'])]
+    if not recent:
+        return
+    existing = exists().where(TimelineEntry.user_id == Follow.follower_id, TimelineEntry.article_id == Article.id)
+    rows = (select(Follow.follower_id, Article.id, Article.user_id, Article.create_time)
+            .join(Article, Article.user_id == Follow.followed_id)
+            .where(Follow.followed_id == author_id, Article.id.in_(recent), ~existing))
+    db.session.execute(TimelineEntry.__table__.insert().from_select(TIMELINE_COLUMNS, rows))
+
+
+def on_unfollow(follower_id, author_id):
+    """
+    取消关注时删除该作者在粉丝时间线中的文章(随调用方的 commit 提交)
+    调用方已减少作者的粉丝数；作者因此降到阈值时，把作者作为大 V 期间(未写扩散)发布的最近文章补写给其余粉丝，
+    否则这些文章在粉丝的关注动态中消失
+    """
+    TimelineEntry.query.filter_by(user_id=follower_id, author_id=author_id).delete(synchronize_session=False)
+    if _followers_count(author_id) == current_app.config['TIMELINE_FANOUT_MAX_FOLLOWERS']:
+        _fanout_recent(author_id)
+
+
+def home_timeline(user_id, cursor, limit):
+    """
+    关注动态的一页(最新优先)，返回 (文章列表, 下一页游标)；limit 为 None 时返回全部
+    - 时间线表按 (user_id, create_time, article_id) 索引做一次范围扫描
+    - 关注的大 V(未写扩散)的文章按相同游标单独查询后合并
+    """
+    popular_ids = [author_id for author_id, in db.session.query(Follow.followed_id)
+                   .join(User, User.id == Follow.followed_id)
+                   .filter(Follow.follower_id == user_id,
+                           User.followers_count > current_app.config['TIMELINE_FANOUT_MAX_FOLLOWERS'])]
+    fanned = _visible(Article.query.join(TimelineEntry, TimelineEntry.article_id == Article.id)
+                      .filter(TimelineEntry.user_id == user_id))
+    fetch = limit + 1 if limit is not None else None
+    articles = keyset_query(fanned.options(joinedload(Article.user)), TIMELINE_ORDER, cursor, fetch).all()
+    if popular_ids:
+        pulled = _visible(Article.query.filter(Article.user_id.in_(popular_ids)))
+        articles += keyset_query(pulled.options(joinedload(Article.user)),
+                                 (Article.create_time, Article.id), cursor, fetch).all()
+        # 作者粉丝数跨过阈值前后发布的文章可能两边都有
+        articles = sorted({article.id: article for article in articles}.values(),
+                          key=lambda article: (article.create_time, article.id), reverse=True)
+    if limit is None or len(articles) <= limit:
+        return articles, None
+    articles = articles[:limit]
+    return articles, encode_cursor([articles[-1].create_time, articles[-1].id])
+
+
+def rebuild_timelines():
+    """重建所有时间线(升级后首次运行或调整阈值后)：每个未超过阈值的作者一条 INSERT ... SELECT，返回写入的作者数"""
+    TimelineEntry.query.delete()
+    db.session.commit()
+    authors = [author_id for author_id, count in db.session.query(User.id, User.followers_count)
+               .filter(User.followers_count > 0) if not is_popular(count)]
+    for author_id in authors:
+        _fanout_recent(author_id)
+        db.session.commit()
+    return len(authors)
+
+
+def backfill_timelines():
+    """
+    升级后首次启动时构建所有时间线，完成后写入迁移标记(只执行一次)
+    在用户计数列回填之后执行(是否写扩散按粉丝数判断)
+    返回本次是否执行了构建
+    """
+    if DataMigration.is_applied(TIMELINES_BACKFILL):
+        return False
+    authors = rebuild_timelines()
+    DataMigration.mark_applied(TIMELINES_BACKFILL)
+    logging.info(f"关注动态时间线已构建: {authors} 个作者")
+    return True
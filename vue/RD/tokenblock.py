@@ -1,7 +1,202 @@
-from datetime import datetime
+import math
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+import logging
+from sqlalchemy import and_, or_, bindparam
 from __init__ import db
+from db import DataMigration
+
+# 旧记录没有 expires_at，按 Token 有效期(与 create_access_token 一致，1 天)推算过期时间
+LEGACY_TOKEN_LIFETIME = timedelta(days=1)
+TOKEN_EXPIRY_BACKFILL = 'token_expiry_backfill'  # 迁移标记：旧注销记录的 expires_at 已回填
 
 class TokenBlocklist(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     jti = db.Column(db.String(40), nullable=False, index=True)
-    created_at = db.Column(db.DateTime, nullable=False)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, index=True)  # Token 的 exp，过期后记录不再生效并由清理任务删除
+
+    @staticmethod
+    def active_filter(now=None):
+        """仍然有效(Token 尚未过期)的注销记录"""
+        now = now or datetime.utcnow()
+        return or_(TokenBlocklist.expires_at > now,
+                   and_(TokenBlocklist.expires_at.is_(None), TokenBlocklist.created_at > now - LEGACY_TOKEN_LIFETIME))
+
+    @staticmethod
+    def expired_filter(now=None):
+        now = now or datetime.utcnow()
+        return or_(TokenBlocklist.expires_at <= now,
+                   and_(TokenBlocklist.expires_at.is_(None), TokenBlocklist.created_at <= now - LEGACY_TOKEN_LIFETIME))
+
+
+class BlocklistCache:
+    """
+    已注销 Token 的进程内缓存，放在 token_in_blocklist_loader 前面
+    - 布隆过滤器：判定"不在黑名单"时不查数据库(绝大多数请求)
+    - 过滤器判定可能存在时，一律按 jti 索引查一次数据库，以数据库为准，不依赖本进程的状态
+    - 本进程注销时直接加入；其他进程的注销按自增 id 增量同步：距上次同步超过 max_staleness 秒时，
+      由当前请求做一次同步(主键范围查询，通常没有新行)，其他进程注销的 Token 最多在 max_staleness 秒内仍被接受
+    - 元素数超过容量时按两倍容量重建过滤器
+    - 只加载未过期的记录；过期记录由清理任务删除，之后重建过滤器去掉已过期的 jti
+    - 重建时在锁外构建新的位数组，构建完成后一次替换，期间旧过滤器继续生效
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001, max_staleness=1.0):
+        self.lock = threading.Lock()
+        self.error_rate = error_rate
+        self.max_staleness = max_staleness
+        self.synced_at = None  # 上次开始同步的时间(time.monotonic())，None 表示尚未加载
+        self.last_id = 0  # 已同步到的 token_blocklist 最大 id
+        self.added_during_rebuild = None  # 重建期间本进程注销的 jti，替换时补进新过滤器
+        self._reset(capacity)
+
+    def init_app(self, app):
+        self.error_rate = app.config['BLOCKLIST_BLOOM_ERROR_RATE']
+        self.max_staleness = app.config['BLOCKLIST_MAX_STALENESS_SECONDS']
+        self._reset(app.config['BLOCKLIST_BLOOM_CAPACITY'])
+
+    def _shape(self, capacity):
+        """容量对应的 (位数, 哈希函数个数)"""
+        n_bits = max(8, int(-capacity * math.log(self.error_rate) / math.log(2) ** 2))
+        return n_bits, max(1, round(n_bits / capacity * math.log(2)))
+
+    def _reset(self, capacity):
+        self.capacity = capacity
+        self.n_bits, self.n_hashes = self._shape(capacity)
+        self.bits = bytearray((self.n_bits + 7) // 8)
+        self.count = 0
+
+    @staticmethod
+    def _positions(jti, n_bits, n_hashes):
+        digest = hashlib.blake2b(jti.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % n_bits for i in range(n_hashes)]
+
+    @classmethod
+    def _set_bits(cls, bits, jti, n_bits, n_hashes):
+        """把 jti 加入位数组，返回是否是新元素(加入前已全部置位的视为重复，不计数)"""
+        new = False
+        for pos in cls._positions(jti, n_bits, n_hashes):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                new = True
+        return new
+
+    def _add_bits(self, jti):
+        # 本进程 add() 过的 jti 之后还会由 sync 从数据库读到，重复的不再计数，避免提前触发扩容
+        if self._set_bits(self.bits, jti, self.n_bits, self.n_hashes):
+            self.count += 1
+
+    def _might_contain(self, jti):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(jti, self.n_bits, self.n_hashes))
+
+    def _claim_sync(self):
+        """距上次同步超过 max_staleness 时由调用方同步，同一时刻只有一个请求认领"""
+        now = time.monotonic()
+        with self.lock:
+            if self.synced_at is not None and now - self.synced_at < self.max_staleness:
+                return False
+            self.synced_at = now
+            return True
+
+    def sync(self):
+        """从数据库增量加载新增的注销记录(首次调用时全量加载)"""
+        with self.lock:
+            self.synced_at = time.monotonic()
+        rows = (db.session.query(TokenBlocklist.id, TokenBlocklist.jti)
+                .filter(TokenBlocklist.id > self.last_id, TokenBlocklist.active_filter())
+                .order_by(TokenBlocklist.id).all())
+        with self.lock:
+            for row_id, jti in rows:
+                self._add_bits(jti)
+                self.last_id = max(self.last_id, row_id)
+            grow = self.count > self.capacity
+        if grow:
+            self.rebuild(self.capacity * 2)
+
+    def rebuild(self, capacity=None):
+        """按当前有效的注销记录重新构建过滤器(扩容或清理过期记录后)，构建期间旧过滤器继续生效"""
+        capacity = capacity or self.capacity
+        n_bits, n_hashes = self._shape(capacity)
+        bits = bytearray((n_bits + 7) // 8)
+        with self.lock:
+            self.added_during_rebuild = []
+        try:
+            rows = (db.session.query(TokenBlocklist.id, TokenBlocklist.jti)
+                    .filter(TokenBlocklist.active_filter()).order_by(TokenBlocklist.id).all())
+            count = sum(self._set_bits(bits, jti, n_bits, n_hashes) for _, jti in rows)
+            with self.lock:
+                for jti in self.added_during_rebuild:
+                    count += self._set_bits(bits, jti, n_bits, n_hashes)
+                self.capacity, self.n_bits, self.n_hashes = capacity, n_bits, n_hashes
+                self.bits, self.count = bits, count
+                self.last_id = rows[-1][0] if rows else 0
+        finally:
+            with self.lock:
+                self.added_during_rebuild = None
+        self.sync()  # 补上构建期间其他进程新增的记录
+
+    def add(self, jti):
+        """本进程注销 Token 后调用(数据库写入已提交)"""
+        with self.lock:
+            self._add_bits(jti)
+            if self.added_during_rebuild is not None:
+                self.added_during_rebuild.append(jti)
+
+    def is_revoked(self, jti):
+        if self._claim_sync():
+            self.sync()
+        with self.lock:
+            if not self._might_contain(jti):
+                return False
+        return (db.session.query(TokenBlocklist.id)
+                .filter(TokenBlocklist.jti == jti, TokenBlocklist.active_filter()).first()) is not None
+
+
+blocklist_cache = BlocklistCache()
+
+
+def purge_expired_tokens(batch_size=1000):
+    """清理任务：分批删除已过期的注销记录(每批单独提交，避免长事务和大范围锁)，之后重建本进程的过滤器"""
+    purged = 0
+    now = datetime.utcnow()
+    while True:
+        ids = [row_id for row_id, in db.session.query(TokenBlocklist.id)
+               .filter(TokenBlocklist.expired_filter(now)).order_by(TokenBlocklist.id).limit(batch_size)]
+        if not ids:
+            break
+        TokenBlocklist.query.filter(TokenBlocklist.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        purged += len(ids)
+    blocklist_cache.rebuild()
+    return purged
+
+
+def backfill_token_expiry(batch_size=1000):
+    """
+    升级后首次启动时为旧注销记录(expires_at 为空)回填过期时间 created_at + LEGACY_TOKEN_LIFETIME，
+    之后按 expires_at 索引判断和清理；完成后写入迁移标记(只执行一次)
+    返回回填的行数
+    """
+    if DataMigration.is_applied(TOKEN_EXPIRY_BACKFILL):
+        return 0
+    table = TokenBlocklist.__table__
+    stmt = table.update().where(table.c.id == bindparam('b_id')).values(expires_at=bindparam('b_expires_at'))
+    filled = 0
+    while True:
+        rows = (db.session.query(TokenBlocklist.id, TokenBlocklist.created_at)
+                .filter(TokenBlocklist.expires_at.is_(None)).order_by(TokenBlocklist.id).limit(batch_size).all())
+        if not rows:
+            break
+        db.session.execute(stmt, [{'b_id': row_id, 'b_expires_at': created_at + LEGACY_TOKEN_LIFETIME}
+                                  for row_id, created_at in rows])
+        db.session.commit()
+        filled += len(rows)
+    DataMigration.mark_applied(TOKEN_EXPIRY_BACKFILL)
+    logging.info(f"旧注销记录的过期时间已回填: {filled} 行")
+    return filled
@@ -0,0 +1,52 @@
+import logging
+from sqlalchemy import bindparam
+from __init__ import db
+from db import User, DataMigration
+
+USER_COUNTERS_BACKFILL = 'user_counters_backfill'  # 迁移标记：用户表上的计数列已按实际数据回填
+
+
+def reconcile_user_counters(batch_size=1000, fix=True):
+    """
+    按批重新计算用户表上的冗余计数列(每批一条聚合查询)，与列中的值比较
+    - fix=True 时把有偏差的行改为重新计算的值(每批一次 executemany)
+    - 返回偏差列表 [(user_id, 字段, 列中的值, 实际值)]
+    """
+    names = list(User.COUNTER_COLUMNS)
+    table = User.__table__
+    stmt = (table.update().where(table.c.id == bindparam('b_id'))
+            .values({name: bindparam(f'b_{name}') for name in names}))
+    drift = []
+    last_id = 0
+    while True:
+        rows = (db.session.query(User.id, *[getattr(User, name) for name in names])
+                .filter(User.id > last_id).order_by(User.id).limit(batch_size).all())
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        actual = User.count_aggregates((row[0] for row in rows), names)
+        updates = []
+        for user_id, *stored in rows:
+            counts = actual.get(user_id, {})
+            wrong = [(name, value, counts.get(name, 0)) for name, value in zip(names, stored)
+                     if value != counts.get(name, 0)]
+            if wrong:
+                drift.extend((user_id, name, value, count) for name, value, count in wrong)
+                updates.append({'b_id': user_id, **{f'b_{name}': counts.get(name, 0) for name in names}})
+        if fix and updates:
+            db.session.execute(stmt, updates)
+            db.session.commit()
+    return drift
+
+
+def backfill_user_counters():
+    """
+    升级后首次启动时按实际数据回填用户表上新增的计数列(列补上时全为 0)，完成后写入迁移标记(只执行一次)
+    返回本次是否执行了回填
+    """
+    if DataMigration.is_applied(USER_COUNTERS_BACKFILL):
+        return False
+    drift = reconcile_user_counters()
+    DataMigration.mark_applied(USER_COUNTERS_BACKFILL)
+    logging.info(f"用户计数列已回填: {len(drift)} 处修正")
+    return True